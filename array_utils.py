@@ -0,0 +1,357 @@
+import numpy as np
+
+#
+# batched (numpy) versions of the per bone math in utils.py
+# matrices are stored row-major, (N, 4, 4), same layout as np.array(mathutils.Matrix)
+#
+
+
+####pose bone matrices####
+
+def get_pose_bone_indices(obj, bone_names):
+	'''	index of each named bone in obj.pose.bones '''
+
+	index_map = {bone.name: i for i, bone in enumerate(obj.pose.bones)}
+	return np.array([index_map[bone_name] for bone_name in bone_names], dtype=np.int64)
+
+
+def get_parent_pose_bone_indices(obj, bone_names):
+	'''	index of each named bone's parent in obj.pose.bones,
+		bones without parent get len(obj.pose.bones), which is the identity
+		matrix appended by read_pose_bone_matrices
+	'''
+
+	index_map = {bone.name: i for i, bone in enumerate(obj.pose.bones)}
+	no_parent = len(obj.pose.bones)
+	indices = []
+	for bone_name in bone_names:
+		parent = obj.pose.bones[bone_name].parent
+		indices.append(index_map[parent.name] if parent else no_parent)
+	return np.array(indices, dtype=np.int64)
+
+
+def get_parent_to_rest_matrix_stack(obj, bone_names):
+	'''	(N, 4, 4) stack of the matrix converting from each bone's parent to its rest,
+		for bones without parent this is rest inverted, which makes
+		get_final_current_to_rest_matrices the same as utils.get_final_current_to_rest_matrix
+	'''
+
+	stack = np.empty((len(bone_names), 4, 4))
+	for i, bone_name in enumerate(bone_names):
+		pose_bone = obj.pose.bones[bone_name]
+		rest_matrix = pose_bone.bone.matrix_local
+		if pose_bone.parent:
+			stack[i] = np.array(rest_matrix.inverted() @ pose_bone.parent.bone.matrix_local)
+		else:
+			stack[i] = np.array(rest_matrix.inverted())
+	return stack
+
+
+def read_pose_bone_matrices(obj, out=None):
+	'''	read pose.bones[].matrix of all bones with a single foreach_get.
+		returns (len(pose.bones) + 1, 4, 4), the last one is identity
+		so it can be used as the parent of bones without parent
+	'''
+
+	count = len(obj.pose.bones)
+
+	if out is None:
+		out = np.empty((count + 1, 4, 4), dtype=np.float32)
+
+	# blender matrices are column-major in memory
+	raw = np.empty(count * 16, dtype=np.float32)
+	obj.pose.bones.foreach_get('matrix', raw)
+	out[:count] = raw.reshape(count, 4, 4).transpose(0, 2, 1)
+	out[count] = np.identity(4)
+
+	return out
+
+
+def get_final_current_to_rest_matrices(pose_matrices, bone_indices, parent_indices, parent_to_rest_stack):
+	'''	vectorized utils.get_final_current_to_rest_matrix for many bones at once.
+		pose_matrices comes from read_pose_bone_matrices,
+		indices and stack from the get_*_indices / get_parent_to_rest_matrix_stack functions
+	'''
+
+	current = pose_matrices[bone_indices].astype(np.float64)
+	parent = pose_matrices[parent_indices].astype(np.float64)
+
+	# parent.inverted() @ current, without building the inverse
+	current_to_parent = np.linalg.solve(parent, current)
+
+	return parent_to_rest_stack @ current_to_parent
+
+
+####curve simplification####
+
+def rdp_keep_mask(x, y, tolerance):
+	'''	Ramer-Douglas-Peucker simplification of a sampled curve.
+		the error is measured along y, as the distance to the straight line between the kept neighbours,
+		so tolerance is in the curve's own unit (per channel).
+		returns a bool mask of the samples to keep, the first and last are always kept
+	'''
+
+	x = np.asarray(x, dtype=np.float64)
+	y = np.asarray(y, dtype=np.float64)
+
+	count = len(x)
+	keep = np.zeros(count, dtype=bool)
+	if count == 0:
+		return keep
+
+	keep[0] = True
+	keep[-1] = True
+
+	# iterative, long takes would hit the recursion limit
+	stack = [(0, count - 1)]
+	while stack:
+		first, last = stack.pop()
+		if last - first < 2:
+			continue
+
+		t = (x[first + 1:last] - x[first]) / (x[last] - x[first])
+		line = y[first] + t * (y[last] - y[first])
+		errors = np.abs(y[first + 1:last] - line)
+
+		i = int(np.argmax(errors))
+		if errors[i] > tolerance:
+			split = first + 1 + i
+			keep[split] = True
+			stack.append((first, split))
+			stack.append((split, last))
+
+	return keep
+
+
+####curve smoothing####
+
+def savgol_fit_matrix(window, order):
+	'''	Savitzky-Golay matrix (window, window), the least squares fit of a polynomial of the given order
+		over window samples, evaluated at each sample: the center row holds the smoothing coefficients.
+		window must be odd and > order
+	'''
+
+	half = window // 2
+	x = np.arange(-half, half + 1, dtype=np.float64)
+	vandermonde = x[:, None] ** np.arange(order + 1)
+
+	return vandermonde @ np.linalg.pinv(vandermonde)
+
+
+def savgol_filter(values, window, order):
+	'''	Savitzky-Golay smoothing of values (frames, ...) along the first axis,
+		the first / last half window take the polynomial fitted on the first / last full window, like scipy's mode='interp'.
+		window is clamped to the number of samples, values are returned unchanged if it is too short to fit order
+	'''
+
+	values = np.asarray(values, dtype=np.float64)
+
+	count = len(values)
+	window = min(window, count - 1 + count % 2) # largest odd window that fits
+	if window <= order or window < 3:
+		return values.copy()
+
+	fit = savgol_fit_matrix(window, order)
+	half = window // 2
+
+	result = np.empty_like(values)
+
+	# (frames, ..., window) @ (window,)
+	windows = np.lib.stride_tricks.sliding_window_view(values, window, axis=0)
+	result[half:count - half] = windows @ fit[half]
+
+	# (half, window) @ (window, ...)
+	result[:half] = np.tensordot(fit[:half], values[:window], axes=1)
+	result[count - half:] = np.tensordot(fit[half + 1:], values[count - window:], axes=1)
+
+	return result
+
+
+def get_saccade_segments(values, velocity_threshold):
+	'''	split samples (frames, channels) where they move more than velocity_threshold in one frame,
+		returns [(start, end)] slices bounds of the segments between the jumps
+	'''
+
+	values = np.asarray(values, dtype=np.float64).reshape(len(values), -1)
+
+	speeds = np.linalg.norm(np.diff(values, axis=0), axis=1)
+	jumps = np.flatnonzero(speeds > velocity_threshold) + 1 # first sample after each jump
+
+	bounds = np.concatenate([[0], jumps, [len(values)]])
+	return [(int(start), int(end)) for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+def smooth_preserving_saccades(values, window, order, velocity_threshold):
+	'''	savgol_filter of values (frames, channels), each segment between saccades filtered separately,
+		so sharp jumps of the eyes are kept instead of being smeared over the window
+	'''
+
+	values = np.asarray(values, dtype=np.float64)
+	result = np.empty_like(values)
+
+	for start, end in get_saccade_segments(values, velocity_threshold):
+		result[start:end] = savgol_filter(values[start:end], window, order)
+
+	return result
+
+
+####vector math####
+# batched utils.lerp_vector, dot, cross, magnitude, normalize, scale and vector_add:
+# arguments are arrays of vectors (..., 3), a single vector broadcasts against a batch.
+# shapes are checked once per call, not per vector
+
+def as_vectors(v, size=3):
+	'''	v as a float64 array of vectors of the given size, raises ValueError if its last axis doesn't match '''
+
+	v = np.asarray(v, dtype=np.float64)
+	if v.ndim == 0 or v.shape[-1] != size:
+		raise ValueError(f"expected vectors of size {size}, got an array of shape {v.shape}")
+	return v
+
+
+def as_factors(t):
+	'''	scalar or per vector factors, shaped to broadcast against (..., size) vectors '''
+	return np.asarray(t, dtype=np.float64)[..., np.newaxis]
+
+
+def lerp_vectors(a, b, t):
+	a = as_vectors(a)
+	b = as_vectors(b)
+	t = as_factors(t)
+	return (1.0 - t) * a + t * b
+
+
+def dot_vectors(a, b):
+	'''	(...) dot products '''
+	return np.sum(as_vectors(a) * as_vectors(b), axis=-1)
+
+
+def cross_vectors(a, b):
+	return np.cross(as_vectors(a), as_vectors(b))
+
+
+def vector_magnitudes(v):
+	'''	(...) lengths '''
+	return np.linalg.norm(as_vectors(v), axis=-1)
+
+
+def normalize_vectors(v, size=3):
+	'''	unit vectors, zero length vectors are left at zero '''
+
+	v = as_vectors(v, size)
+	lengths = np.linalg.norm(v, axis=-1, keepdims=True)
+	return np.divide(v, lengths, out=np.zeros_like(v), where=lengths > 0.0)
+
+
+def scale_vectors(v, m):
+	'''	m: scalar or one factor per vector '''
+	return as_vectors(v) * as_factors(m)
+
+
+def add_vectors(a, b):
+	return as_vectors(a) + as_vectors(b)
+
+
+####quaternions####
+# (..., 4) arrays in blender's order, w x y z
+
+def normalize_quaternions(q):
+	return normalize_vectors(q, 4)
+
+
+def make_quaternions_compatible(q):
+	'''	flip the quaternions of a sequence (N, 4) so each one is in the same hemisphere as the previous one,
+		the batched version of what utils.decompose_to_transform_channels does, so curves don't flip
+	'''
+
+	q = as_vectors(q, 4)
+	if len(q) < 2:
+		return q.copy()
+
+	flips = np.sum(q[1:] * q[:-1], axis=-1) < 0.0
+	signs = np.cumprod(np.concatenate([[1.0], np.where(flips, -1.0, 1.0)]))
+	return q * signs[:, np.newaxis]
+
+
+def slerp_quaternions(a, b, t):
+	'''	spherical interpolation from a to b, along the shortest path.
+		t: scalar or one factor per quaternion
+	'''
+
+	a = normalize_quaternions(a)
+	b = normalize_quaternions(b)
+	t = as_factors(t)
+
+	d = np.sum(a * b, axis=-1, keepdims=True)
+	b = np.where(d < 0.0, -b, b)
+	d = np.abs(d)
+
+	# nearly the same rotation, sin(theta) would be close to 0, interpolate linearly instead
+	close = d > 0.9995
+	theta = np.arccos(np.clip(d, 0.0, 1.0))
+	sin_theta = np.where(close, 1.0, np.sin(theta))
+
+	weight_a = np.where(close, 1.0 - t, np.sin((1.0 - t) * theta) / sin_theta)
+	weight_b = np.where(close, t, np.sin(t * theta) / sin_theta)
+
+	return normalize_quaternions(weight_a * a + weight_b * b)
+
+
+def quaternions_to_matrices(q):
+	'''	(..., 4) quaternions -> (..., 3, 3) rotation matrices '''
+
+	w, x, y, z = np.moveaxis(normalize_quaternions(q), -1, 0)
+
+	matrices = np.empty(w.shape + (3, 3))
+	matrices[..., 0, 0] = 1.0 - 2.0 * (y * y + z * z)
+	matrices[..., 0, 1] = 2.0 * (x * y - w * z)
+	matrices[..., 0, 2] = 2.0 * (x * z + w * y)
+	matrices[..., 1, 0] = 2.0 * (x * y + w * z)
+	matrices[..., 1, 1] = 1.0 - 2.0 * (x * x + z * z)
+	matrices[..., 1, 2] = 2.0 * (y * z - w * x)
+	matrices[..., 2, 0] = 2.0 * (x * z - w * y)
+	matrices[..., 2, 1] = 2.0 * (y * z + w * x)
+	matrices[..., 2, 2] = 1.0 - 2.0 * (x * x + y * y)
+	return matrices
+
+
+def matrices_to_quaternions(matrices):
+	'''	rotation of (..., 3, 3) or (..., 4, 4) matrices as (..., 4) quaternions, scale is removed first '''
+
+	m = np.asarray(matrices, dtype=np.float64)[..., :3, :3]
+	m = m / np.linalg.norm(m, axis=-2, keepdims=True)
+
+	m00, m01, m02 = m[..., 0, 0], m[..., 0, 1], m[..., 0, 2]
+	m10, m11, m12 = m[..., 1, 0], m[..., 1, 1], m[..., 1, 2]
+	m20, m21, m22 = m[..., 2, 0], m[..., 2, 1], m[..., 2, 2]
+
+	# solve from the largest component, for precision: 4 * w^2, 4 * x^2, 4 * y^2, 4 * z^2
+	squares = np.stack([1.0 + m00 + m11 + m22, 1.0 + m00 - m11 - m22, 1.0 - m00 + m11 - m22, 1.0 - m00 - m11 + m22])
+	s = 2.0 * np.sqrt(np.maximum(squares, 1e-12))
+
+	candidates = np.stack([
+		np.stack([s[0] / 4.0, (m21 - m12) / s[0], (m02 - m20) / s[0], (m10 - m01) / s[0]], axis=-1),
+		np.stack([(m21 - m12) / s[1], s[1] / 4.0, (m01 + m10) / s[1], (m02 + m20) / s[1]], axis=-1),
+		np.stack([(m02 - m20) / s[2], (m01 + m10) / s[2], s[2] / 4.0, (m12 + m21) / s[2]], axis=-1),
+		np.stack([(m10 - m01) / s[3], (m02 + m20) / s[3], (m12 + m21) / s[3], s[3] / 4.0], axis=-1),
+	])
+
+	largest = np.argmax(squares, axis=0)
+	q = np.take_along_axis(candidates, largest[np.newaxis, ..., np.newaxis], axis=0)[0]
+	return normalize_quaternions(q)
+
+
+####matrix batch ops####
+
+def transform_points(matrices, points):
+	'''	matrices (..., 4, 4) @ points (..., 3), with translation '''
+
+	matrices = np.asarray(matrices, dtype=np.float64)
+	return transform_directions(matrices, points) + matrices[..., :3, 3]
+
+
+def transform_directions(matrices, directions):
+	'''	matrices (..., 4, 4) or (..., 3, 3) @ directions (..., 3), without translation '''
+
+	matrices = np.asarray(matrices, dtype=np.float64)
+	return np.einsum('...ij,...j->...i', matrices[..., :3, :3], as_vectors(directions))
@@ -0,0 +1,82 @@
+"""
+Fast bake worker, run by baking_utils.parallel_bake in a background blender process:
+
+	blender -b <copy of the .blend> --python bake_worker.py -- <job.json>
+
+job.json: {"targets": [[armature name, [bone names]]], "start_frame": int, "end_frame": int, "output": path of the .npz to write,
+           "package": package name of the addon}
+
+The frame range is sampled with the same FastBakeJob as the interactive bake,
+and the cached matrices of each target are saved as arr_0, arr_1, ... in the .npz.
+Nothing happens when this module is imported by auto_load.
+"""
+
+import bpy
+import sys
+import json
+import types
+import importlib
+import importlib.util
+import numpy as np
+from pathlib import Path
+
+
+def load_addon(package):
+	'''	import this addon under its real package name, which isn't always its folder name:
+		extensions are bl_ext.<repository>.<name>, and a folder name like x_anim-main isn't importable.
+		the worker loads the user's preferences, so the addon is usually enabled already,
+		otherwise it is loaded from its folder and registered
+	'''
+
+	if package in bpy.context.preferences.addons and package in sys.modules:
+		return importlib.import_module(package + ".baking_utils.baking_utils")
+
+	addon_dir = Path(__file__).resolve().parent.parent
+
+	# parent packages of an extension (bl_ext, bl_ext.<repository>) may not exist when the addon isn't enabled
+	parts = package.split(".")
+	for i in range(1, len(parts)):
+		parent_name = ".".join(parts[:i])
+		if parent_name in sys.modules:
+			continue
+		try:
+			importlib.import_module(parent_name)
+		except ImportError:
+			parent = types.ModuleType(parent_name)
+			parent.__path__ = []
+			sys.modules[parent_name] = parent
+
+	spec = importlib.util.spec_from_file_location(package, addon_dir / "__init__.py", submodule_search_locations=[str(addon_dir)])
+	addon = importlib.util.module_from_spec(spec)
+	sys.modules[package] = addon
+	spec.loader.exec_module(addon)
+	addon.register()
+
+	return importlib.import_module(package + ".baking_utils.baking_utils")
+
+
+def main():
+	argv = sys.argv[sys.argv.index("--") + 1:]
+
+	with open(argv[0]) as file:
+		job_info = json.load(file)
+
+	baking_utils = load_addon(job_info["package"])
+
+	targets = [(bpy.data.objects[obj_name], bone_names) for obj_name, bone_names in job_info["targets"]]
+
+	job = baking_utils.FastBakeJob(targets, job_info["start_frame"], job_info["end_frame"])
+
+	job.begin()
+	try:
+		job.sample_frames()
+	finally:
+		job.end()
+
+	np.savez(job_info["output"], *[bake_target.cached_matrices for bake_target in job.bake_targets])
+
+	print(f"Bake worker sampled frames {job_info['start_frame']} - {job_info['end_frame']} in {job.sample_time:.2f} seconds.")
+
+
+if __name__ == "__main__":
+	main()
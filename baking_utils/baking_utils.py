@@ -1,8 +1,16 @@
 import bpy
+import os
 import time
+import json
+import shutil
+import tempfile
+import subprocess
+import numpy as np
+
+from mathutils import Matrix
 
 from bpy.types import Context, Operator, Panel
-from .. import ui_utils, utils
+from .. import array_utils, fcurve_utils, sampling_utils, ui_utils, utils
 from typing import Callable
 
 #
@@ -14,130 +22,440 @@ def fast_bake_selected_bones_location(start_frame, end_frame, progress: ui_utils
 	Bake the location keyframes for the selected bones in the active armature.
 	"""
 
+	return fast_bake_selected_bones(start_frame, end_frame, progress, location=True, rotation=False, scale=False)
+
+
+def is_bake_range_valid(start_frame, end_frame):
+	if end_frame < start_frame:
+		print(f"Nothing to bake, end frame {end_frame} is before start frame {start_frame}.")
+		return False
+	return True
+
+
+def fast_bake_selected_bones(start_frame, end_frame, progress: ui_utils.ProgressCallback = None, location=True, rotation=True, scale=True, tolerances: dict = None, all_armatures=False):
+	"""
+	Bake the visual transform keyframes (location, rotation, scale) for the selected bones in the active armature.
+	Rotation is baked into the channel matching each bone's rotation_mode.
+
+	tolerances: {'location': float, 'rotation': float, 'scale': float}, when given, 
+	each channel is reduced (Ramer-Douglas-Peucker) to the keyframes needed for linear interpolation
+	to stay within its tolerance of every sample.
+
+	all_armatures: bake every selected armature instead, in a single sweep of the frame range (see get_bake_targets).
+
+	Returns (number of keyframes written, number of samples), or None if nothing was baked.
+	"""
+
+	if not is_bake_range_valid(start_frame, end_frame):
+		return
+
+	targets = get_bake_targets(all_armatures)
+	if not targets:
+		return
+
+	job = FastBakeJob(targets, start_frame, end_frame, location, rotation, scale, tolerances)
+
+	job.begin()
+	try:
+		job.sample_frames(progress=progress)
+	finally:
+		job.end()
+
+	job.write_keyframes(progress)
+
+	job.print_stats()
+
+	return job.written_keys, job.sampled_keys
+
+
+def get_bake_targets(all_armatures=False):
+	"""
+	[(armature, names of bones to bake)], the armatures are switched to pose mode.
+
+	by default, the active armature and its selected bones.
+	with all_armatures, every selected armature, with its selected bones, or all its deform bones when none is selected.
+	empty if there is nothing to bake.
+	"""
+
 	obj = bpy.context.active_object
 
 	if obj is None or obj.type != 'ARMATURE':
 		print("No active armature object.")
-		return
+		return []
 	
 	# Ensure we are in pose mode
 	bpy.context.view_layer.objects.active = obj
 	bpy.ops.object.mode_set(mode='POSE')
 
-	# Gather the selected pose bones
-	selected_bones = [bone.name for bone in obj.pose.bones if bone.bone.select]
-	if not selected_bones:
-		print("No bones selected.")
-		return
-	
-	# total child tasks = num of frames * num of bones
-	
-	start_time = time.time()  # Start timing
-	
-	# Build a map from selected bone to its parent_to_rest_matrix
-	parent_to_rest_matrix_map = {bone_name: utils.get_parent_to_rest_matrix(obj.pose.bones[bone_name]) for bone_name in selected_bones}
+	if not all_armatures:
+		# Gather the selected pose bones
+		selected_bones = [bone.name for bone in obj.pose.bones if bone.bone.select]
+		if not selected_bones:
+			print("No bones selected.")
+			return []
+		return [(obj, selected_bones)]
+
+	targets = []
+	armatures = [o for o in bpy.context.selected_objects if o.type == 'ARMATURE']
+	if obj not in armatures:
+		armatures.insert(0, obj)
 
-	# Collect final locations without inserting keyframes
-	## this is to avoid changing the animation curves while we are still evaluating them
+	for armature in armatures:
+		bone_names = [bone.name for bone in armature.pose.bones if bone.bone.select]
+		if not bone_names:
+			bone_names = [bone.name for bone in armature.pose.bones if bone.bone.use_deform]
+		if bone_names:
+			targets.append((armature, bone_names))
 
-	cached_locations = {bone_name: [] for bone_name in selected_bones} # bone_name to (frame, location) map
+	if not targets:
+		print("No bones to bake.")
 
-	total_child_tasks = (end_frame - start_frame + 1)
+	return targets
 
-	for frame in range(start_frame, end_frame + 1):
 
-		# call progress for this loop
-		## this is called only on first level loop for performance issues
-		if callable(progress):
-			progress(frame - start_frame, total_child_tasks)
+class FastBakeTarget:
+	"""
+	One armature of a FastBakeJob, with its precomputed bone data and cached samples.
+	"""
 
-		# 
+	def __init__(self, obj, bone_names, total_frames):
+		self.obj = obj
+		self.bone_names = bone_names
 
-		utils.set_frame_fast(frame)
+		# Precompute bone / parent indices and the parent_to_rest matrix of every bone
+		self.bone_indices = array_utils.get_pose_bone_indices(obj, bone_names)
+		self.parent_indices = array_utils.get_parent_pose_bone_indices(obj, bone_names)
+		self.parent_to_rest_stack = array_utils.get_parent_to_rest_matrix_stack(obj, bone_names)
+		self.pose_matrices = None
 
-		for bone_name in selected_bones:
-			bone = obj.pose.bones[bone_name]
-			location = utils.get_final_local_location(bone, parent_to_rest_matrix_map[bone_name])
-			cached_locations[bone_name].append((frame, location))
-			
+		self.cached_matrices = np.empty((total_frames, len(bone_names), 4, 4)) # [frame index, bone index] to current_to_rest_matrix
 
-	# Insert keyframe
+	def sample(self, frame_index):
+		self.pose_matrices = array_utils.read_pose_bone_matrices(self.obj, self.pose_matrices)
+		self.cached_matrices[frame_index] = array_utils.get_final_current_to_rest_matrices(self.pose_matrices, self.bone_indices, self.parent_indices, self.parent_to_rest_stack)
 
-	child_task_index = 0
-	total_child_tasks = len(selected_bones)
 
-	for bone_name in selected_bones:
-		
-		# call progress for this loop
-		## this is called only on first level loop for performance issues
-		child_task_index += 1
-		if callable(progress):
-			progress(child_task_index, total_child_tasks)
+class FastBakeJob:
+	"""
+	Two-pass fast bake of one or more armatures, split in steps so it can also run in chunks (see X_ANIM_OT_fast_bake_modal):
 
-		#
+	begin()            : precompute bone data and set up the frame sampler
+	sample_frames(n)   : cache the visual transforms of the next n frames, nothing is written to the curves,
+	                     this is to avoid changing the animation curves while we are still evaluating them.
+	                     every armature is sampled at each frame, so the frame range is swept only once
+	end()              : tear down the frame sampler
+	write_keyframes()  : write all cached samples in bulk, armature by armature
 
-		bone = obj.pose.bones[bone_name]
-		
-		for frame, location in cached_locations[bone_name]:
-			bone.location = location
-			
-			for i in range(3):
-				if not bone.lock_location[i]:
-					bone.keyframe_insert(data_path='location', frame=frame, index=i, group=bone_name)
+	cancel() before write_keyframes() leaves the animation untouched.
+	"""
 
+	def __init__(self, targets, start_frame, end_frame, location=True, rotation=True, scale=True, tolerances: dict = None):
+		'''	targets: [(armature, bone names)], see get_bake_targets '''
 
-	end_time = time.time()  # End timing
-	duration = end_time - start_time
-	print(f"Animation baking completed in {duration:.2f} seconds.")
+		self.targets = targets
+		self.frames = np.arange(start_frame, end_frame + 1)
+		self.location = location
+		self.rotation = rotation
+		self.scale = scale
+		self.tolerances = tolerances
 
+		self.bake_targets = [] # FastBakeTarget per armature, created in begin()
+		self.frame_index = 0 # index of the next frame to sample
+		self.sampler = None
+		self.original_frame = None
 
-def clear_locked_channels_fcurves():
-	# Get the active object
-	armature = bpy.context.object
-	if armature.type != 'ARMATURE':
-		print("Active object is not an armature.")
+		self.sample_time = 0.0
+		self.write_time = 0.0
+		self.written_keys = 0
+		self.sampled_keys = 0
+
+	@property
+	def total_frames(self):
+		return len(self.frames)
+
+	@property
+	def is_sampled(self):
+		return self.frame_index >= self.total_frames
+
+	def begin(self):
+		start_time = time.time()
+
+		self.original_frame = bpy.context.scene.frame_current
+
+		self.bake_targets = [FastBakeTarget(obj, bone_names, self.total_frames) for obj, bone_names in self.targets]
+
+		self.sampler = sampling_utils.get_frame_sampler([obj for obj, bone_names in self.targets])
+		self.sampler.__enter__()
+
+		self.sample_time += time.time() - start_time
+
+	def sample_frames(self, count=None, progress: ui_utils.ProgressCallback = None):
+		"""
+		Sample the next count frames (all remaining if None), returns True when all frames are sampled.
+		"""
+
+		start_time = time.time()
+
+		end_index = self.total_frames if count is None else min(self.frame_index + count, self.total_frames)
+
+		for frame_index in range(self.frame_index, end_index):
+
+			# call progress for this loop
+			## this is called only on first level loop for performance issues
+			if callable(progress):
+				progress(frame_index, self.total_frames)
+
+			# 
+
+			self.sampler.set_frame(int(self.frames[frame_index]))
+
+			for bake_target in self.bake_targets:
+				bake_target.sample(frame_index)
+
+		self.frame_index = end_index
+
+		self.sample_time += time.time() - start_time
+
+		return self.is_sampled
+
+	def end(self):
+		if self.sampler is not None:
+			self.sampler.__exit__(None, None, None)
+			self.sampler = None
+
+	def cancel(self):
+		"""
+		Drop the cached samples and go back to the frame the bake started from.
+		"""
+
+		self.end()
+		self.bake_targets = []
+		if self.original_frame is not None:
+			utils.set_frame_fast(self.original_frame)
+
+	def write_keyframes(self, progress: ui_utils.ProgressCallback = None):
+		"""
+		Insert keyframes.
+		Each fcurve is found or created once and all its keyframes are written in bulk.
+		"""
+
+		start_time = time.time()
+
+		child_task_index = 0
+		total_child_tasks = sum(len(bake_target.bone_names) for bake_target in self.bake_targets)
+
+		for bake_target in self.bake_targets:
+
+			obj = bake_target.obj
+			action = utils.get_or_create_action(obj)
+
+			for bone_index, bone_name in enumerate(bake_target.bone_names):
+				
+				# call progress for this loop
+				## this is called only on first level loop for performance issues
+				child_task_index += 1
+				if callable(progress):
+					progress(child_task_index, total_child_tasks)
+
+				#
+
+				bone = obj.pose.bones[bone_name]
+				self.write_bone_keyframes(action, bone, bake_target.cached_matrices[:, bone_index])
+
+		self.write_time += time.time() - start_time
+
+	def write_bone_keyframes(self, action, bone, bone_matrices):
+		frames = self.frames
+		if len(frames) == 0:
+			return
+
+		channels = {}
+		if self.rotation or self.scale:
+			channels = utils.decompose_to_transform_channels(bone, [Matrix(matrix) for matrix in bone_matrices], False, self.rotation, self.scale)
+		if self.location:
+			channels['location'] = bone_matrices[:, :3, 3]
+
+		for prop, values in channels.items():
+			data_path = bone.path_from_id(prop)
+			locks = utils.get_transform_locks(bone, prop)
+			values = np.asarray(values)
+
+			for i, locked in enumerate(locks):
+				if locked:
+					continue
+
+				fcurve = utils.get_or_create_fcurve(action, data_path, index=i, group=bone.name)
+				self.sampled_keys += len(frames)
+
+				if self.tolerances is None:
+					utils.bulk_insert_keyframes(fcurve, frames, values[:, i])
+					self.written_keys += len(frames)
+				else:
+					tolerance = self.tolerances['location' if prop == 'location' else 'scale' if prop == 'scale' else 'rotation']
+					keep = array_utils.rdp_keep_mask(frames, values[:, i], tolerance)
+					utils.bulk_insert_keyframes(fcurve, frames[keep], values[keep, i], interpolation='LINEAR', clear_range=True)
+					self.written_keys += int(keep.sum())
+
+	def print_stats(self):
+		print(f"Sampling completed in {self.sample_time:.2f} seconds.")
+		print(f"Keyframe writing completed in {self.write_time:.2f} seconds.")
+		print(f"Animation baking completed in {self.sample_time + self.write_time:.2f} seconds.")
+		print(f"{self.written_keys} keyframes written for {self.sampled_keys} samples.")
+
+
+BAKE_WORKER_POLL_SECONDS = 0.2
+
+def stop_bake_worker(process):
+	'''	terminate a bake worker if it is still running, kill it if it doesn't exit '''
+
+	if process.poll() is not None:
 		return
 
-	# Get the active action
-	action = armature.animation_data.action if armature.animation_data else None
-	if not action:
-		print("No active action found for the armature.")
+	process.terminate()
+	try:
+		process.wait(timeout=5.0)
+	except subprocess.TimeoutExpired:
+		process.kill()
+		process.wait()
+
+def parallel_bake(start_frame, end_frame, worker_count, progress: ui_utils.ProgressCallback = None, location=True, rotation=True, scale=True, tolerances: dict = None, all_armatures=False):
+	"""
+	Same as fast_bake_selected_bones, but the frame range is split in segments that are sampled in parallel
+	by background blender processes (see bake_worker.py) working on a saved copy of the current file.
+	The sampled matrices are merged and written in one bulk pass here.
+	No GPU or window is needed by the workers.
+
+	Only for animation that can be evaluated frame by frame independently, simulations won't match.
+
+	Returns (number of keyframes written, number of samples), or None if nothing was baked.
+	"""
+
+	if not is_bake_range_valid(start_frame, end_frame):
 		return
 
-	# Generate a map of selected bones
-	selected_bones = {bone.name: bone for bone in armature.pose.bones if bone.bone.select}
-	if not selected_bones:
-		print("No bones selected.")
+	targets = get_bake_targets(all_armatures)
+	if not targets:
 		return
 
-	def is_locked_transform_channel(bone, data_path, array_index):
-		lock_index = array_index % 3
-		
-		if "location" in data_path and bone.lock_location[lock_index]:
-			return True
-		if "rotation_quaternion" in data_path and bone.lock_rotation[lock_index]:
-			return True
-		if "rotation_euler" in data_path and bone.lock_rotation[lock_index]:
-			return True
-		if "scale" in data_path and bone.lock_scale[lock_index]:
-			return True
-		
-		return False
+	job = FastBakeJob(targets, start_frame, end_frame, location, rotation, scale, tolerances)
+	job.bake_targets = [FastBakeTarget(obj, bone_names, job.total_frames) for obj, bone_names in targets]
+
+	start_time = time.time()
+
+	temp_dir = tempfile.mkdtemp(prefix="x_anim_bake_")
+	workers = []
+	try:
+		blend_path = os.path.join(temp_dir, "bake.blend")
+		bpy.ops.wm.save_as_mainfile(filepath=blend_path, copy=True)
+
+		# no --factory-startup: the workers load the user's preferences, so the add-ons
+		# whose functions scripted drivers call from the driver namespace are enabled too
+		command = [bpy.app.binary_path, "-b", blend_path, "--python-exit-code", "1"]
+		if bpy.context.preferences.filepaths.use_scripts_auto_execute:
+			command.append("--enable-autoexec")
+		else:
+			command.append("--disable-autoexec")
+		command += ["--python", os.path.join(os.path.dirname(__file__), "bake_worker.py"), "--"]
+
+		# launch one worker per segment of the frame range
+		segments = [segment for segment in np.array_split(np.arange(job.total_frames), max(1, worker_count)) if len(segment)]
+
+		for segment_index, segment in enumerate(segments):
+			job_path = os.path.join(temp_dir, f"segment_{segment_index}.json")
+			output_path = os.path.join(temp_dir, f"segment_{segment_index}.npz")
+
+			with open(job_path, 'w') as file:
+				json.dump({
+					"targets": [[obj.name, bone_names] for obj, bone_names in targets],
+					"start_frame": int(job.frames[segment[0]]),
+					"end_frame": int(job.frames[segment[-1]]),
+					"output": output_path,
+					# the addon's real package, its folder name isn't always importable (extensions, dashes)
+					"package": __package__.rpartition('.')[0],
+				}, file)
+
+			workers.append((segment, output_path, subprocess.Popen(command + [job_path])))
+
+		# wait for all of them, polling so progress keeps being reported
+		running = [process for segment, output_path, process in workers]
+		while running:
+			try:
+				running[0].wait(timeout=BAKE_WORKER_POLL_SECONDS)
+			except subprocess.TimeoutExpired:
+				pass
+			running = [process for process in running if process.poll() is None]
+			if callable(progress):
+				progress(len(workers) - len(running), len(workers))
+
+		failed = [process.args for segment, output_path, process in workers if process.returncode != 0]
+		if failed:
+			print(f"{len(failed)} bake workers failed, nothing written, see their output above.")
+			return
+
+		# merge
+		for segment, output_path, process in workers:
+			with np.load(output_path) as data:
+				for target_index, bake_target in enumerate(job.bake_targets):
+					bake_target.cached_matrices[segment] = data[f"arr_{target_index}"]
+
+	finally:
+		# on error or interruption, don't leave the workers running
+		for segment, output_path, process in workers:
+			stop_bake_worker(process)
+		shutil.rmtree(temp_dir, ignore_errors=True)
+
+	job.frame_index = job.total_frames
+	job.sample_time = time.time() - start_time
+
+	job.write_keyframes(progress)
+
+	job.print_stats()
+
+	return job.written_keys, job.sampled_keys
 
-	# Loop through all fcurves in the action
-	for fcurve in action.fcurves[:]:
-		data_path = fcurve.data_path
-		
-		# Extract the bone name from the data path
-		if data_path.startswith("pose.bones"):
-			bone_name = data_path.split('"')[1]
-			
-			# Check if the bone is selected
-			bone = selected_bones.get(bone_name)
-			if bone and is_locked_transform_channel(bone, data_path, fcurve.array_index):
-				action.fcurves.remove(fcurve)
+
+def clear_locked_channels_fcurves():
+	"""
+	Remove the fcurves of locked transform channels of the selected bones,
+	in every selected armature, from the active action and all NLA strip actions.
+	"""
+
+	armatures = [obj for obj in bpy.context.selected_objects if obj.type == 'ARMATURE']
+	if bpy.context.object and bpy.context.object.type == 'ARMATURE' and bpy.context.object not in armatures:
+		armatures.append(bpy.context.object)
+
+	if not armatures:
+		print("No armature selected.")
+		return
+
+	transform_props = ('location', 'rotation_quaternion', 'rotation_euler', 'rotation_axis_angle', 'scale')
+	removed = 0
+
+	for armature in armatures:
+
+		# lock mask of all selected bones: (bone name, property, array index) of locked channels
+		locked_channels = set()
+		for bone in armature.pose.bones:
+			if not bone.bone.select:
+				continue
+			for prop in transform_props:
+				for i, locked in enumerate(utils.get_transform_locks(bone, prop)):
+					if locked:
+						locked_channels.add((bone.name, prop, i))
+
+		if not locked_channels:
+			continue
+
+		for action in fcurve_utils.get_object_actions(armature):
+			fcurve_index = fcurve_utils.get_fcurve_index(action)
+
+			for key in locked_channels:
+				fcurve = fcurve_index.find(*key)
+				if fcurve is not None:
+					action.fcurves.remove(fcurve)
+					removed += 1
 	
-	print("Finished removing locked transform fcurves.")
+	print(f"Finished removing {removed} locked transform fcurves.")
 #
 # operators
 #
@@ -148,6 +466,38 @@ def clear_locked_channels_fcurves():
 class x_fast_bake_locations_properties(bpy.types.PropertyGroup):
 	start_frame : bpy.props.IntProperty(name="start frame")
 	end_frame : bpy.props.IntProperty(name="end frame")
+	bake_location : bpy.props.BoolProperty(name="location", default=True)
+	bake_rotation : bpy.props.BoolProperty(name="rotation", default=True)
+	bake_scale : bpy.props.BoolProperty(name="scale", default=True)
+	decimate : bpy.props.BoolProperty(name="reduce keys", description="Only write the keyframes needed to stay within the tolerances, with linear interpolation", default=False)
+	location_tolerance : bpy.props.FloatProperty(name="location tolerance", default=0.001, min=0.0, precision=4)
+	rotation_tolerance : bpy.props.FloatProperty(name="rotation tolerance", description="Radians for euler, raw component value for quaternion / axis angle", default=0.001, min=0.0, precision=4)
+	scale_tolerance : bpy.props.FloatProperty(name="scale tolerance", default=0.001, min=0.0, precision=4)
+	all_armatures : bpy.props.BoolProperty(name="all selected armatures", description="Bake every selected armature in one sweep of the frame range, their selected bones, or all deform bones if none is selected", default=False)
+	worker_count : bpy.props.IntProperty(name="workers", description="Background blender processes baking in parallel", default=max(1, (os.cpu_count() or 2) - 1), min=1)
+	chunk_size : bpy.props.IntProperty(name="frames per step", description="Frames sampled between UI updates when baking in the background", default=10, min=1)
+
+
+def get_bake_tolerances(props):
+	if not props.decimate:
+		return None
+	return {'location': props.location_tolerance, 'rotation': props.rotation_tolerance, 'scale': props.scale_tolerance}
+
+def draw_bake_decimate_props(layout, props):
+	row = layout.row()
+	row.prop(props, "decimate")
+	if props.decimate:
+		col = layout.column(align=True)
+		col.prop(props, "location_tolerance")
+		col.prop(props, "rotation_tolerance")
+		col.prop(props, "scale_tolerance")
+
+def report_bake_result(operator, result):
+	if result is None:
+		operator.report({'WARNING'}, "Nothing baked, check the console")
+		return
+	written_keys, sampled_keys = result
+	operator.report({'INFO'}, f"{written_keys} keyframes written for {sampled_keys} samples")
 
 class X_ANIM_OT_fast_bake_locations(Operator):
 	bl_idname = "x_anim.fast_bake_locations"
@@ -167,10 +517,61 @@ class X_ANIM_OT_fast_bake_locations(Operator):
 
 		ui_utils.default_progress_begin()
 
-		fast_bake_selected_bones_location(start_frame, end_frame, ui_utils.default_progress_update)
+		result = fast_bake_selected_bones(start_frame, end_frame, ui_utils.default_progress_update,
+			location=True, rotation=False, scale=False, tolerances=get_bake_tolerances(props), all_armatures=props.all_armatures)
+
+		ui_utils.default_progress_end()
+
+		report_bake_result(self, result)
+
+		return {'FINISHED'}
+	
+	def draw(self, context):
+		layout = self.layout
+
+		props = bpy.context.scene.x_fast_bake_locations_properties
+
+		row = layout.row()
+
+		row.prop(props, "start_frame")
+		row.prop(props, "end_frame")
+
+		row = layout.row()
+
+		row.prop(props, "all_armatures")
+
+		draw_bake_decimate_props(layout, props)
+	
+	def invoke(self, context, event):
+		return context.window_manager.invoke_props_dialog(self)
+	
+
+##       
+## fast bake transforms
+##
+class X_ANIM_OT_fast_bake_transforms(Operator):
+	bl_idname = "x_anim.fast_bake_transforms"
+	bl_label = "Fast Bake Transforms"
+	bl_description = "Bake visual location, rotation and scale of selected bones, after constraints, drivers and IK"
+	bl_options = {'REGISTER', 'UNDO'}
+
+	@classmethod
+	def poll(cls, context):
+		return True
+
+	def execute(self, context: Context):
+		
+		props = bpy.context.scene.x_fast_bake_locations_properties
+
+		ui_utils.default_progress_begin()
+
+		result = fast_bake_selected_bones(props.start_frame, props.end_frame, ui_utils.default_progress_update,
+			location=props.bake_location, rotation=props.bake_rotation, scale=props.bake_scale, tolerances=get_bake_tolerances(props), all_armatures=props.all_armatures)
 
 		ui_utils.default_progress_end()
 
+		report_bake_result(self, result)
+
 		return {'FINISHED'}
 	
 	def draw(self, context):
@@ -182,6 +583,219 @@ class X_ANIM_OT_fast_bake_locations(Operator):
 
 		row.prop(props, "start_frame")
 		row.prop(props, "end_frame")
+
+		row = layout.row()
+
+		row.prop(props, "all_armatures")
+
+		row = layout.row()
+
+		row.prop(props, "bake_location")
+		row.prop(props, "bake_rotation")
+		row.prop(props, "bake_scale")
+
+		draw_bake_decimate_props(layout, props)
+	
+	def invoke(self, context, event):
+		return context.window_manager.invoke_props_dialog(self)
+	
+
+##       
+## fast bake transforms in the background
+##
+
+# viewport navigation, still allowed while the background bake runs
+BAKE_MODAL_PASS_THROUGH_EVENTS = {
+	'MOUSEMOVE', 'INBETWEEN_MOUSEMOVE', 'MIDDLEMOUSE', 'WHEELUPMOUSE', 'WHEELDOWNMOUSE',
+	'TRACKPADPAN', 'TRACKPADZOOM', 'MOUSEROTATE', 'MOUSESMARTZOOM', 'NDOF_MOTION',
+}
+
+class X_ANIM_OT_fast_bake_modal(Operator):
+	bl_idname = "x_anim.fast_bake_modal"
+	bl_label = "Fast Bake Transforms (Background)"
+	bl_description = "Fast bake transforms a few frames at a time, the UI stays responsive, shows progress and Esc cancels without writing any keyframe"
+	# no REGISTER: redo would run execute again, which only starts another modal bake
+	bl_options = {'UNDO'}
+
+	_timer = None
+	_job = None
+	_start_time = 0.0
+
+	@classmethod
+	def poll(cls, context):
+		return True
+
+	def execute(self, context: Context):
+
+		props = bpy.context.scene.x_fast_bake_locations_properties
+
+		if not is_bake_range_valid(props.start_frame, props.end_frame):
+			report_bake_result(self, None)
+			return {'CANCELLED'}
+
+		targets = get_bake_targets(props.all_armatures)
+		if not targets:
+			report_bake_result(self, None)
+			return {'CANCELLED'}
+
+		self._job = FastBakeJob(targets, props.start_frame, props.end_frame,
+			props.bake_location, props.bake_rotation, props.bake_scale, get_bake_tolerances(props))
+		self._job.begin()
+		self._start_time = time.time()
+
+		ui_utils.default_progress_begin()
+
+		wm = context.window_manager
+		self._timer = wm.event_timer_add(0.001, window=context.window)
+		wm.modal_handler_add(self)
+
+		return {'RUNNING_MODAL'}
+
+	def modal(self, context, event):
+
+		if event.type == 'ESC' and event.value == 'PRESS':
+			self._job.cancel()
+			self.finish(context)
+			self.report({'WARNING'}, "Bake cancelled, no keyframe written")
+			return {'CANCELLED'}
+
+		if event.type in BAKE_MODAL_PASS_THROUGH_EVENTS:
+			return {'PASS_THROUGH'}
+
+		# everything else is blocked until the bake is done: saving would write the temporary
+		# isolation view layer and collection to the file, and undo, deleting or renaming the armatures
+		# or editing their keys would invalidate the job's bones and cached samples.
+		# blender also postpones autosave while a modal operator is running
+		if event.type != 'TIMER':
+			return {'RUNNING_MODAL'}
+
+		props = bpy.context.scene.x_fast_bake_locations_properties
+		job = self._job
+
+		try:
+			is_sampled = job.sample_frames(props.chunk_size)
+		except Exception:
+			job.cancel()
+			self.finish(context)
+			raise
+
+		# progress, throughput and ETA
+		elapsed = time.time() - self._start_time
+		frames_per_second = job.frame_index / elapsed if elapsed > 0 else 0.0
+		eta = (job.total_frames - job.frame_index) / frames_per_second if frames_per_second > 0 else 0.0
+		ui_utils.default_progress_update(job.frame_index, job.total_frames)
+		context.workspace.status_text_set(f"Fast bake: {job.frame_index}/{job.total_frames} frames, {frames_per_second:.1f} fps, ETA {eta:.1f}s, Esc to cancel")
+
+		if not is_sampled:
+			return {'RUNNING_MODAL'}
+
+		try:
+			job.end()
+			job.write_keyframes()
+			job.print_stats()
+		finally:
+			self.finish(context)
+
+		report_bake_result(self, (job.written_keys, job.sampled_keys))
+
+		return {'FINISHED'}
+
+	def cancel(self, context):
+		# called by blender when it aborts the modal, e.g. when a file is loaded or the window is closed
+		self._job.cancel()
+		self.finish(context)
+
+	def finish(self, context):
+		if self._timer is not None:
+			context.window_manager.event_timer_remove(self._timer)
+			self._timer = None
+		if context.workspace is not None:
+			context.workspace.status_text_set(None)
+		ui_utils.default_progress_end()
+
+	def draw(self, context):
+		layout = self.layout
+
+		props = bpy.context.scene.x_fast_bake_locations_properties
+
+		row = layout.row()
+
+		row.prop(props, "start_frame")
+		row.prop(props, "end_frame")
+
+		row = layout.row()
+
+		row.prop(props, "all_armatures")
+
+		row = layout.row()
+
+		row.prop(props, "bake_location")
+		row.prop(props, "bake_rotation")
+		row.prop(props, "bake_scale")
+
+		row = layout.row()
+
+		row.prop(props, "chunk_size")
+
+		draw_bake_decimate_props(layout, props)
+	
+	def invoke(self, context, event):
+		return context.window_manager.invoke_props_dialog(self)
+	
+
+##       
+## fast bake transforms in parallel
+##
+class X_ANIM_OT_fast_bake_parallel(Operator):
+	bl_idname = "x_anim.fast_bake_parallel"
+	bl_label = "Fast Bake Transforms (Parallel)"
+	bl_description = "Fast bake transforms, sampling segments of the frame range in parallel background blender processes. For long takes"
+	bl_options = {'REGISTER', 'UNDO'}
+
+	@classmethod
+	def poll(cls, context):
+		return True
+
+	def execute(self, context: Context):
+		
+		props = bpy.context.scene.x_fast_bake_locations_properties
+
+		ui_utils.default_progress_begin()
+
+		result = parallel_bake(props.start_frame, props.end_frame, props.worker_count, ui_utils.default_progress_update,
+			location=props.bake_location, rotation=props.bake_rotation, scale=props.bake_scale, tolerances=get_bake_tolerances(props), all_armatures=props.all_armatures)
+
+		ui_utils.default_progress_end()
+
+		report_bake_result(self, result)
+
+		return {'FINISHED'}
+	
+	def draw(self, context):
+		layout = self.layout
+
+		props = bpy.context.scene.x_fast_bake_locations_properties
+
+		row = layout.row()
+
+		row.prop(props, "start_frame")
+		row.prop(props, "end_frame")
+
+		row = layout.row()
+
+		row.prop(props, "all_armatures")
+
+		row = layout.row()
+
+		row.prop(props, "bake_location")
+		row.prop(props, "bake_rotation")
+		row.prop(props, "bake_scale")
+
+		row = layout.row()
+
+		row.prop(props, "worker_count")
+
+		draw_bake_decimate_props(layout, props)
 	
 	def invoke(self, context, event):
 		return context.window_manager.invoke_props_dialog(self)
@@ -243,9 +857,18 @@ class x_anim_PT_baking_utils(Panel):
 		layout = self.layout
 		props = bpy.context.scene.x_anim
 
+		row = layout.row()
+		row.prop(props, "isolate_sampling")
+
 		row = layout.row()
 		ui_utils.default_operator_button(row, X_ANIM_OT_fast_bake_locations)
 		row = layout.row()
+		ui_utils.default_operator_button(row, X_ANIM_OT_fast_bake_transforms)
+		row = layout.row()
+		ui_utils.default_operator_button(row, X_ANIM_OT_fast_bake_modal)
+		row = layout.row()
+		ui_utils.default_operator_button(row, X_ANIM_OT_fast_bake_parallel)
+		row = layout.row()
 		ui_utils.default_operator_button(row, X_ANIM_OT_force_clear_transform)
 		row = layout.row()
 		ui_utils.default_operator_button(row, X_ANIM_OT_clear_locked_channels_anim)
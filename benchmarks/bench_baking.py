@@ -0,0 +1,197 @@
+"""
+Benchmark of baking_utils' fast bake on a synthetic rig, headless, no GPU or window needed:
+
+	blender -b --factory-startup --python benchmarks/bench_baking.py -- --bones 60 --depth 4 --constraints 1 --frames 2000 --output result.json
+
+A rig of `bones` bones, in chains of `depth` parented bones, is built in an empty scene.
+The root of each chain is keyed with random rotations, and every bone gets `constraints`
+Copy Rotation constraints targeting the root of the previous chain.
+The sample pass and the write pass are timed separately, results are printed as JSON
+(and written to --output) so runs can be compared over time.
+"""
+
+import bpy
+import sys
+import json
+import time
+import random
+import argparse
+import importlib
+from pathlib import Path
+
+
+def load_addon():
+	'''	import and register the addon this script belongs to '''
+
+	addon_dir = Path(__file__).resolve().parent.parent
+	sys.path.insert(0, str(addon_dir.parent))
+
+	addon = importlib.import_module(addon_dir.name)
+	addon.register()
+
+	return addon
+
+
+def parse_args():
+	argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+
+	parser = argparse.ArgumentParser(description="fast bake benchmark")
+	parser.add_argument("--bones", type=int, default=60)
+	parser.add_argument("--depth", type=int, default=4, help="bones per parent chain")
+	parser.add_argument("--constraints", type=int, default=1, help="Copy Rotation constraints per bone")
+	parser.add_argument("--frames", type=int, default=500)
+	parser.add_argument("--repeat", type=int, default=3)
+	parser.add_argument("--rotation", action="store_true", help="also bake rotation and scale")
+	parser.add_argument("--tolerance", type=float, default=None, help="reduce keys with this tolerance")
+	parser.add_argument("--no-isolate", action="store_true", help="sample the whole scene, see sampling_utils")
+	parser.add_argument("--seed", type=int, default=0)
+	parser.add_argument("--output", default=None)
+	return parser.parse_args(argv)
+
+
+def build_rig(addon, bone_count, depth, constraint_count, frame_count, seed):
+	'''	synthetic armature in the emptied current scene, returns the armature object '''
+
+	utils = importlib.import_module(addon.__name__ + ".utils")
+	random.seed(seed)
+
+	scene = bpy.context.scene
+	for obj in list(scene.objects):
+		bpy.data.objects.remove(obj)
+
+	armature_data = bpy.data.armatures.new("bench_rig")
+	obj = bpy.data.objects.new("bench_rig", armature_data)
+	scene.collection.objects.link(obj)
+	bpy.context.view_layer.objects.active = obj
+
+	# bones, in chains of depth
+	bpy.ops.object.mode_set(mode='EDIT')
+	chain_roots = []
+	parent = None
+	for i in range(bone_count):
+		edit_bone = armature_data.edit_bones.new(f"bone_{i:04d}")
+		chain = i // depth
+		link = i % depth
+		edit_bone.head = (chain * 0.5, 0.0, link * 1.0)
+		edit_bone.tail = (chain * 0.5, 0.0, link * 1.0 + 1.0)
+		if link == 0:
+			parent = None
+			chain_roots.append(edit_bone.name)
+		edit_bone.parent = parent
+		edit_bone.use_connect = parent is not None
+		parent = edit_bone
+	bpy.ops.object.mode_set(mode='POSE')
+
+	# constraints, to the root of the previous chain, so there is no dependency cycle
+	for i, pose_bone in enumerate(obj.pose.bones):
+		chain = i // depth
+		if chain == 0:
+			continue
+		for c in range(constraint_count):
+			constraint = pose_bone.constraints.new('COPY_ROTATION')
+			constraint.target = obj
+			constraint.subtarget = chain_roots[chain - 1]
+			constraint.influence = 0.5 / (c + 1)
+
+	# random rotation keys on chain roots, every 10 frames
+	action = utils.get_or_create_action(obj)
+	key_frames = list(range(1, frame_count + 1, 10))
+	for root in chain_roots:
+		pose_bone = obj.pose.bones[root]
+		pose_bone.rotation_mode = 'XYZ'
+		data_path = pose_bone.path_from_id('rotation_euler')
+		for i in range(3):
+			fcurve = utils.get_or_create_fcurve(action, data_path, index=i, group=root)
+			utils.bulk_insert_keyframes(fcurve, key_frames, [random.uniform(-1.0, 1.0) for frame in key_frames])
+
+	for pose_bone in obj.pose.bones:
+		pose_bone.bone.select = True
+
+	return obj
+
+
+def run(addon, args):
+	baking_utils = importlib.import_module(addon.__name__ + ".baking_utils.baking_utils")
+
+	obj = build_rig(addon, args.bones, args.depth, args.constraints, args.frames, args.seed)
+	bpy.context.scene.x_anim.isolate_sampling = not args.no_isolate
+
+	bone_names = [pose_bone.name for pose_bone in obj.pose.bones]
+	tolerances = None
+	if args.tolerance is not None:
+		tolerances = {'location': args.tolerance, 'rotation': args.tolerance, 'scale': args.tolerance}
+
+	source_action = obj.animation_data.action
+
+	runs = []
+	for r in range(args.repeat):
+		# start every run from the same animation
+		obj.animation_data.action = source_action.copy()
+
+		job = baking_utils.FastBakeJob([(obj, bone_names)], 1, args.frames,
+			location=True, rotation=args.rotation, scale=args.rotation, tolerances=tolerances)
+
+		start_time = time.perf_counter()
+		job.begin()
+		try:
+			job.sample_frames()
+		finally:
+			job.end()
+		sample_seconds = time.perf_counter() - start_time
+
+		start_time = time.perf_counter()
+		job.write_keyframes()
+		write_seconds = time.perf_counter() - start_time
+
+		runs.append({
+			"sample_seconds": sample_seconds,
+			"write_seconds": write_seconds,
+			"written_keys": job.written_keys,
+			"sampled_keys": job.sampled_keys,
+		})
+
+		bpy.data.actions.remove(obj.animation_data.action)
+		obj.animation_data.action = source_action
+
+	return runs
+
+
+def median(values):
+	values = sorted(values)
+	middle = len(values) // 2
+	if len(values) % 2:
+		return values[middle]
+	return (values[middle - 1] + values[middle]) / 2.0
+
+
+def main():
+	args = parse_args()
+	addon = load_addon()
+
+	runs = run(addon, args)
+
+	result = {
+		"blender_version": bpy.app.version_string,
+		"bones": args.bones,
+		"depth": args.depth,
+		"constraints": args.constraints,
+		"frames": args.frames,
+		"rotation": args.rotation,
+		"tolerance": args.tolerance,
+		"isolate_sampling": not args.no_isolate,
+		"sample_seconds": median([r["sample_seconds"] for r in runs]),
+		"write_seconds": median([r["write_seconds"] for r in runs]),
+		"frames_per_second": args.frames / max(median([r["sample_seconds"] for r in runs]), 1e-9),
+		"runs": runs,
+	}
+
+	text = json.dumps(result, indent=2)
+	print(text)
+
+	if args.output:
+		with open(args.output, 'w') as file:
+			file.write(text)
+
+
+if __name__ == "__main__":
+	main()
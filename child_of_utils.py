@@ -0,0 +1,237 @@
+import bpy
+import numpy as np
+from mathutils import Matrix, Vector
+from . import array_utils
+
+#
+# Child Of constraints, solved with matrices
+#
+# a Child Of is evaluated in world space, with all its channels enabled it gives
+#	result = parent @ inverse_matrix @ owner
+# which is blended with the owner by influence, translations are blended linearly.
+# so for locations each Child Of is the affine map
+#	(1 - influence) * identity + influence * (parent @ inverse_matrix)
+# and a stack of them is the product of those maps, in constraint order.
+# other constraint types are ignored, as they were by utils.set_bone_position.
+#
+
+
+def is_active_child_of(c):
+	return c.type == 'CHILD_OF' and c.enabled and c.target is not None and c.influence > 0.0
+
+
+class FrameMatrices:
+	'''	world and pose matrices read at the current frame, memoized:
+		batched, each armature's pose matrices are read once with a single foreach_get,
+		otherwise each bone's matrix is read on its own, cheaper when only a few bones are needed.
+		each matrix_world and each inverse is computed once.
+		nothing is read again until clear(), create one per operation and clear it after changing the pose
+	'''
+
+	def __init__(self, batched=True):
+		self.batched = batched
+		self.clear()
+
+	def clear(self):
+		self.pose_matrices = {} # armature name -> (len(pose.bones) + 1, 4, 4), see array_utils.read_pose_bone_matrices
+		self.bone_indices = {} # armature name -> {bone name: index}
+		self.bone_matrices = {} # (armature name, bone name) -> pose_bone.matrix, when not batched
+		self.world_matrices = {} # object name -> matrix_world
+		self.inverses = {} # key -> inverted matrix
+
+	def get_world_matrix(self, obj):
+		matrix = self.world_matrices.get(obj.name)
+		if matrix is None:
+			matrix = self.world_matrices[obj.name] = np.array(obj.matrix_world)
+		return matrix
+
+	def get_pose_matrix(self, obj, bone_name):
+		'''	pose_bone.matrix, identity if bone_name is None '''
+
+		if not self.batched:
+			if bone_name is None:
+				return np.identity(4)
+			matrix = self.bone_matrices.get((obj.name, bone_name))
+			if matrix is None:
+				matrix = self.bone_matrices[(obj.name, bone_name)] = np.array(obj.pose.bones[bone_name].matrix)
+			return matrix
+
+		pose_matrices = self.pose_matrices.get(obj.name)
+		if pose_matrices is None:
+			pose_matrices = self.pose_matrices[obj.name] = array_utils.read_pose_bone_matrices(obj).astype(np.float64)
+			self.bone_indices[obj.name] = {pose_bone.name: i for i, pose_bone in enumerate(obj.pose.bones)}
+
+		if bone_name is None:
+			return pose_matrices[-1]
+		return pose_matrices[self.bone_indices[obj.name][bone_name]]
+
+	def get_parent_world_matrix(self, c):
+		'''	world matrix of the parent of a Child Of: its target, or the target's subtarget bone '''
+
+		matrix = self.get_world_matrix(c.target)
+		if c.subtarget and c.target.type == 'ARMATURE':
+			matrix = matrix @ self.get_pose_matrix(c.target, c.subtarget)
+		return matrix
+
+	def get_inverse(self, key, matrix):
+		inverse = self.inverses.get(key)
+		if inverse is None:
+			inverse = self.inverses[key] = np.linalg.inv(matrix)
+		return inverse
+
+
+def get_child_of_snap_matrices(inverse_matrix, owner_world, parent_world, visual_matrices):
+	'''	pose matrices (before constraints) that keep visual_matrices with a Child Of alone at full influence,
+		which is what switching to it does. all arguments can be stacks of matrices, (..., 4, 4):
+		inverse_matrix of the Child Of, matrix_world of the constrained bone's armature, parent world matrix
+	'''
+
+	# owner_world.inverted() @ inverse_matrix.inverted() @ parent_world.inverted() @ owner_world @ visual
+	world = np.linalg.inv(np.asarray(inverse_matrix)) @ np.linalg.solve(parent_world, owner_world @ visual_matrices)
+	return np.linalg.solve(owner_world, world)
+
+
+def get_child_of_snap_matrix(c, owner, visual_matrix, matrices : FrameMatrices):
+	'''	get_child_of_snap_matrices of c at the current frame, owner is the armature of the constrained bone '''
+	return get_child_of_snap_matrices(np.array(c.inverse_matrix), matrices.get_world_matrix(owner), matrices.get_parent_world_matrix(c), np.asarray(visual_matrix))
+
+
+class ChildOfSolver:
+	'''	world space locations -> bone.location for many pose bones at once, at the current frame,
+		taking their Child Of constraints into account, with partial influences and stacked constraints.
+
+		what doesn't change over time (indices, rest matrices, constraints) is prepared once,
+		matrices and inverses are memoized per frame, so bones sharing an armature or a parent
+		only read and invert it once. the memo only follows scene.frame_current:
+		call clear() after changing the pose within a frame, other than with set_positions.
+
+		matrices: a FrameMatrices shared with other solvers or code, used as is whatever the frame,
+		its owner clears it. by default a single bone is read on its own, several bones in batches
+	'''
+
+	def __init__(self, bones, matrices : FrameMatrices = None):
+		self.bones = list(bones)
+		self.frame = None
+		self.matrices = matrices
+		self.shared_matrices = matrices is not None
+
+		self.parent_to_rest = np.empty((len(self.bones), 4, 4))
+		self.child_ofs = []
+		self.use_rest_matrices = []
+
+		for i, bone in enumerate(self.bones):
+			self.parent_to_rest[i] = array_utils.get_parent_to_rest_matrix_stack(bone.id_data, [bone.name])[0]
+			self.child_ofs.append([c for c in bone.constraints if c.type == 'CHILD_OF'])
+
+			# location follows parent and rest matrices only with the default inheritance,
+			# otherwise blender's own conversion is used, see get_pose_to_local_matrix
+			data_bone = bone.bone
+			self.use_rest_matrices.append(data_bone.use_inherit_rotation and data_bone.inherit_scale == 'FULL' and data_bone.use_local_location)
+
+	def get_frame_matrices(self) -> FrameMatrices:
+		if self.shared_matrices:
+			return self.matrices
+
+		frame = bpy.context.scene.frame_current
+		if self.matrices is None or self.frame != frame:
+			self.frame = frame
+			self.matrices = FrameMatrices(batched=len(self.bones) > 1)
+		return self.matrices
+
+	def clear(self):
+		if self.shared_matrices:
+			self.matrices.clear()
+		else:
+			self.matrices = None
+
+	def get_world_to_pose_matrices(self):
+		'''	(N, 4, 4) matrices converting world space locations to the pose space of each bone, before its constraints '''
+
+		matrices = self.get_frame_matrices()
+		result = np.empty((len(self.bones), 4, 4))
+
+		for i, bone in enumerate(self.bones):
+			owner = bone.id_data
+
+			# pose space -> world space, then through each Child Of
+			pose_to_final = matrices.get_world_matrix(owner)
+			for c in self.child_ofs[i]:
+				if not is_active_child_of(c):
+					continue
+
+				child_of = matrices.get_parent_world_matrix(c) @ np.array(c.inverse_matrix)
+				pose_to_final = ((1.0 - c.influence) * np.identity(4) + c.influence * child_of) @ pose_to_final
+
+			result[i] = np.linalg.inv(pose_to_final)
+
+		return result
+
+	def get_pose_to_local_matrices(self):
+		'''	(N, 4, 4) matrices converting pose space locations to bone.location, what setting bone.matrix.translation does '''
+
+		matrices = self.get_frame_matrices()
+		result = np.empty((len(self.bones), 4, 4))
+
+		for i, bone in enumerate(self.bones):
+			if not self.use_rest_matrices[i]:
+				result[i] = get_pose_to_local_matrix(bone)
+				continue
+
+			owner = bone.id_data
+			parent_name = bone.parent.name if bone.parent else None
+			parent = matrices.get_pose_matrix(owner, parent_name)
+
+			result[i] = self.parent_to_rest[i] @ matrices.get_inverse(('POSE', owner.name, parent_name), parent)
+
+		return result
+
+	def get_world_to_local_matrices(self):
+		'''	(N, 4, 4) matrices converting world space locations to bone.location '''
+		return self.get_pose_to_local_matrices() @ self.get_world_to_pose_matrices()
+
+	def world_to_local(self, positions):
+		'''	(N, 3) world space positions -> (N, 3) bone.location values '''
+
+		return array_utils.transform_points(self.get_world_to_local_matrices(), positions)
+
+	def set_positions(self, positions, key=True):
+		'''	move each bone to its world space position at the current frame, keyframing location if key '''
+
+		for bone, location in zip(self.bones, self.world_to_local(positions)):
+			bone.location = location
+
+			if key:
+				bone.keyframe_insert('location', group=bone.name)
+
+		# the pose changed, parents may have moved
+		self.clear()
+
+
+def get_pose_to_local_matrix(bone):
+	'''	pose space location -> bone.location of one bone, with blender's own conversion.
+		the conversion is affine, so the origin and each axis are probed
+	'''
+
+	armature = bone.id_data
+
+	def to_local(location):
+		return np.array(armature.convert_space(pose_bone=bone,
+			matrix=Matrix.Translation(location),
+			from_space='POSE',
+			to_space='LOCAL').translation)
+
+	origin = to_local(Vector((0, 0, 0)))
+
+	matrix = np.identity(4)
+	for i in range(3):
+		axis = Vector((0, 0, 0))
+		axis[i] = 1
+		matrix[:3, i] = to_local(axis) - origin
+	matrix[:3, 3] = origin
+
+	return matrix
+
+
+def set_bone_positions(bones, positions, key=True, matrices : FrameMatrices = None):
+	'''	world space positions of many pose bones at the current frame, batched utils.set_bone_position(world_space=True) '''
+	ChildOfSolver(bones, matrices).set_positions(positions, key)
@@ -1,38 +1,196 @@
 import bpy
 import mathutils
+import numpy as np
 from bpy.types import Context, Operator, Panel
-from .. import ui_utils, utils
+from bpy.app.handlers import persistent
+from .. import array_utils, child_of_utils, fcurve_utils, sampling_utils, ui_utils, utils
 from typing import Callable
 
+#
+# eye rig profile
+#
+
+class x_anim_eye_rig_profile(bpy.types.PropertyGroup):
+    """
+    Maps the roles of the eye tools to bone names and motion ranges, defaults are the FaceIt rig.
+    """
+    eye_l : bpy.props.StringProperty(name="Eye L", default="c_eye.L")
+    eye_r : bpy.props.StringProperty(name="Eye R", default="c_eye.R")
+    eye_lookat : bpy.props.StringProperty(name="Eye Lookat", default="c_eye_lookat")
+    eye_convergence_slider : bpy.props.StringProperty(name="Eye Convergence", default="c_eye_convergence_slider")
+    eye_target_l : bpy.props.StringProperty(name="Eye Target L", default="c_x_eye_target.l")
+    eye_target_r : bpy.props.StringProperty(name="Eye Target R", default="c_x_eye_target.r")
+    eye_target_center : bpy.props.StringProperty(name="Eye Target Center", default="c_x_eye_target.x")
+    eye_target_convergence_slider : bpy.props.StringProperty(name="Eye Target Convergence", default="c_eye_target_convergence_slider")
+    line_of_sight_l : bpy.props.StringProperty(name="Line Of Sight L", default="x_final_line_of_sight.l")
+    line_of_sight_r : bpy.props.StringProperty(name="Line Of Sight R", default="x_final_line_of_sight.r")
+
+    eye_range : bpy.props.FloatProperty(name="Eye Range", default=5.0, min=0.001, description="The most each eye control can move on x")
+    eye_target_range : bpy.props.FloatProperty(name="Eye Target Range", default=3.2, min=0.001, description="The most each eye target can move on x")
+    convergence_range : bpy.props.FloatProperty(name="Convergence Range", default=4.0, description="Convergence slider y value at full convergence")
+
+class x_anim_eye_utils_properties(bpy.types.PropertyGroup):
+    start_frame : bpy.props.IntProperty(name="start frame")
+    end_frame : bpy.props.IntProperty(name="end frame")
+    profile : bpy.props.PointerProperty(type=x_anim_eye_rig_profile)
+    all_selected : bpy.props.BoolProperty(name="All Selected Armatures", default=False, description="Process every selected armature in a single frame sweep, instead of the active object only")
+
+class x_anim_eye_utils_object_properties(bpy.types.PropertyGroup):
+    use_own_profile : bpy.props.BoolProperty(name="Own Profile", default=False, description="Use this armature's own eye rig profile instead of the scene's")
+    profile : bpy.props.PointerProperty(type=x_anim_eye_rig_profile)
+    live_center : bpy.props.BoolProperty(name="Live Center", default=False, description="The eye controls are driven by live center, set by Live Center / Convergence")
+    live_convergence : bpy.props.BoolProperty(name="Live Convergence", default=False, description="The eye controls are driven by live convergence, set by Live Center / Convergence")
+
+def get_eye_rig_profile(obj):
+    """
+    The profile of the armature if it has its own, otherwise the scene's
+    """
+
+    if obj is not None and obj.x_anim_eye_utils.use_own_profile:
+        return obj.x_anim_eye_utils.profile
+    return bpy.context.scene.x_anim_eye_utils.profile
+
+EYE_RIG_BONE_ROLES = [
+    'eye_l', 'eye_r', 'eye_lookat', 'eye_convergence_slider',
+    'eye_target_l', 'eye_target_r', 'eye_target_center', 'eye_target_convergence_slider',
+    'line_of_sight_l', 'line_of_sight_r',
+]
+
 #
 # util functions
 #
 
-def eye_ctrls_insert_keyframe(cur_frame):
-    bones_insert_keyframe(['c_eye.L', 'c_eye.R', 'c_eye_lookat'], cur_frame)
+def resolve_eye_bones(obj, profile, roles : list):
+    """
+    Look up the bones of the given profile roles once, returns (PoseBones, missing bone names).
+    The PoseBones are used directly in the frame loops, instead of looking them up by name at each frame.
+    """
 
-def eye_ctrls_bake(start_frame, end_frame, progress : ui_utils.ProgressCallback = None):
-    bones_bake(['c_eye.L', 'c_eye.R', 'c_eye_lookat'], start_frame, end_frame, progress)
+    bone_names = [getattr(profile, role) for role in roles]
 
-def bones_insert_keyframe(bone_names : list, cur_frame):
+    if obj is None or obj.type != 'ARMATURE':
+        return [], bone_names
 
-    bones = bpy.context.active_object.pose.bones
+    bones = [obj.pose.bones.get(bone_name) for bone_name in bone_names]
+    missing = [bone_name for bone_name, bone in zip(bone_names, bones) if bone is None]
 
-    for bone_name in bone_names:
-        bones[bone_name].keyframe_insert('location', frame=cur_frame, group=bone_name)
+    return bones, missing
 
-def bones_bake(bone_names : list, start_frame, end_frame, progress : ui_utils.ProgressCallback = None):
-    
-    total_frames = int(end_frame - start_frame + 1)
+class EyeRig:
+    """
+    An armature processed by an eye operator, with its profile and the PoseBones of the roles the operator needs
+    """
+
+    def __init__(self, obj, profile, bones : list):
+        self.obj = obj
+        self.profile = profile
+        self.bones = bones
+
+def get_eye_rig_objects(operator) -> list:
+    """
+    The active armature, or every selected armature when all_selected is enabled, reports when there is none
+    """
+
+    if bpy.context.scene.x_anim_eye_utils.all_selected:
+        objects = [obj for obj in bpy.context.selected_objects if obj.type == 'ARMATURE']
+        if not objects:
+            operator.report({'ERROR'}, "No armature selected")
+    else:
+        obj = bpy.context.view_layer.objects.active
+        objects = [obj] if obj is not None and obj.type == 'ARMATURE' else []
+        if not objects:
+            operator.report({'ERROR'}, "Active object must be an armature")
+
+    return objects
+
+def resolve_eye_rig(operator, obj, roles : list):
+    """
+    EyeRig of obj with the PoseBones of the given roles, None if some are missing, which is reported
+    """
+
+    profile = get_eye_rig_profile(obj)
+    bones, missing = resolve_eye_bones(obj, profile, roles)
+
+    if missing:
+        level = 'WARNING' if bpy.context.scene.x_anim_eye_utils.all_selected else 'ERROR'
+        operator.report({level}, f"Bones not found in {obj.name}: {', '.join(missing)}, see Eye Rig Profile")
+        return None
+
+    return EyeRig(obj, profile, bones)
+
+def resolve_eye_rigs(operator, roles : list) -> list:
+    """
+    EyeRigs of the active armature, or of every selected armature when all_selected is enabled.
+    Armatures missing some of the bones are reported and skipped, returns [] when there is nothing to process.
+    """
+
+    rigs = [resolve_eye_rig(operator, obj, roles) for obj in get_eye_rig_objects(operator)]
+    return [rig for rig in rigs if rig is not None]
+
+def sample_bones_location(rigs : list, frames, progress : ui_utils.ProgressCallback = None) -> list:
+    """
+    Read the location of the bones of each EyeRig at the given frames,
+    returns, per rig, a np.array of shape (len(frames), 3) per bone
+
+    When the locations of a rig only come from keyframes (no driver or NLA blending on them),
+    they are evaluated straight from the fcurves, the other rigs are swept together, once.
+    """
+
+    locations = []
+    swept_rigs = []
+
+    for rig in rigs:
+        data_paths = [bone.path_from_id('location') for bone in rig.bones]
+
+        fcurve_sampler = fcurve_utils.FCurveSampler(rig.obj)
+        channels = [(data_path, i) for data_path in data_paths for i in range(3)]
+
+        if fcurve_sampler.can_sample(channels, frames):
+            locations.append([np.stack([fcurve_sampler.sample(data_path, i, frames) for i in range(3)], axis=1) for data_path in data_paths])
+        else:
+            rig_locations = [np.empty((len(frames), 3)) for bone in rig.bones]
+            locations.append(rig_locations)
+            swept_rigs.append((rig, rig_locations))
+
+    if not swept_rigs:
+        return locations
+
+    with sampling_utils.get_frame_sampler([rig.obj for rig, rig_locations in swept_rigs]) as sampler:
+
+        for i, frame in enumerate(frames):
+            sampler.set_frame(int(frame))
+
+            for rig, rig_locations in swept_rigs:
+                for bone, bone_locations in zip(rig.bones, rig_locations):
+                    bone_locations[i] = bone.location
 
-    for i in range(total_frames):
-        cur_frame = i + start_frame
-        #bpy.context.scene.frame_set(cur_frame)
-        utils.set_frame_fast(cur_frame)
-        bones_insert_keyframe(bone_names, cur_frame)
+            if callable(progress):
+                progress(i, len(frames))
 
-        if callable(progress):
-            progress(i, total_frames)
+    return locations
+
+def write_bones_location(obj, bones : list, locations : list, frames):
+    """
+    Write a np.array of shape (len(frames), 3) per PoseBone as location keyframes, in bulk
+    """
+
+    action = utils.get_or_create_action(obj)
+
+    for bone, values in zip(bones, locations):
+        data_path = bone.path_from_id('location')
+
+        for i in range(3):
+            fcurve = utils.get_or_create_fcurve(action, data_path, index=i, group=bone.name)
+            utils.bulk_insert_keyframes(fcurve, frames, values[:, i])
+
+def get_protected_frames(start_frame, end_frame):
+    """
+    frames from start_frame - 1 to end_frame + 1, and the slice of start_frame to end_frame in them.
+    the frames before start and after end are written back with their own values, 
+    to protect the curve outside the given frame range
+    """
+
+    return np.arange(start_frame - 1, end_frame + 2), slice(1, -1)
 
 #
 # operators
@@ -41,10 +199,6 @@ def bones_bake(bone_names : list, start_frame, end_frame, progress : ui_utils.Pr
 ##       
 ## center eye lookat
 ##
-class x_anim_eye_utils_properties(bpy.types.PropertyGroup):
-    start_frame : bpy.props.IntProperty(name="start frame")
-    end_frame : bpy.props.IntProperty(name="end frame")
-
 class X_ANIM_OT_center_eye_lookat(Operator):
     bl_idname = "x_anim.center_eye_lookat"
     bl_label = "Center c_eye_lookat"
@@ -58,34 +212,28 @@ class X_ANIM_OT_center_eye_lookat(Operator):
     def execute(self, context: Context):
         
         props = bpy.context.scene.x_anim_eye_utils
-        start_frame = props.start_frame
-        end_frame = props.end_frame
-        total_frames = int(end_frame - start_frame + 1)
-
-        bones = bpy.context.view_layer.objects.active.pose.bones
 
-        ui_utils.default_progress_begin()
+        rigs = resolve_eye_rigs(self, ['eye_l', 'eye_r', 'eye_lookat'])
+        if not rigs:
+            return {'CANCELLED'}
 
-        # bake the curve to ensure that the evaluated values of subsequent frames 
-        # are not affected by inserting new frames
-        # add 1 keyframe before start and after end to protect the curve outside the given frame range
-        eye_ctrls_bake(start_frame - 1, end_frame + 1, ui_utils.default_progress_update)
+        # sample first, the curves are written only after all frames are evaluated
+        frames, in_range = get_protected_frames(props.start_frame, props.end_frame)
 
-        for i in range(total_frames):
+        ui_utils.default_progress_begin()
 
-            cur_frame = i + start_frame
-            #bpy.context.scene.frame_set(cur_frame)
-            utils.set_frame_fast(cur_frame)
+        all_locations = sample_bones_location(rigs, frames, ui_utils.default_progress_update)
 
-            center = (bones['c_eye.L'].location + bones['c_eye.R'].location) / 2.0
+        for rig, locations in zip(rigs, all_locations):
+            left, right, lookat = locations
 
-            bones['c_eye.L'].location = bones['c_eye.L'].location - center
-            bones['c_eye.R'].location = bones['c_eye.R'].location - center
-            bones['c_eye_lookat'].location = center
+            center = (left[in_range] + right[in_range]) / 2.0
 
-            eye_ctrls_insert_keyframe(cur_frame)
+            left[in_range] -= center
+            right[in_range] -= center
+            lookat[in_range] = center
 
-            ui_utils.default_progress_update(i, total_frames)
+            write_bones_location(rig.obj, rig.bones, locations, frames)
 
         ui_utils.default_progress_end()
 
@@ -100,6 +248,10 @@ class X_ANIM_OT_center_eye_lookat(Operator):
 
         row.prop(props, "start_frame")
         row.prop(props, "end_frame")
+
+        row = layout.row()
+
+        row.prop(props, "all_selected")
     
     def invoke(self, context, event):
         return context.window_manager.invoke_props_dialog(self)
@@ -126,35 +278,48 @@ class X_ANIM_OT_final_line_of_sight_to_eye_target(Operator):
         end_frame = props.end_frame
         total_frames = int(end_frame - start_frame + 1)
 
-        bones = bpy.context.view_layer.objects.active.pose.bones
+        rigs = resolve_eye_rigs(self, ['line_of_sight_l', 'line_of_sight_r', 'eye_target_center', 'eye_target_l', 'eye_target_r'])
+        if not rigs:
+            return {'CANCELLED'}
 
         ui_utils.default_progress_begin()
 
-        # First loop: Collect locations
-        frame_data = []
-        for i in range(total_frames):
-            cur_frame = i + start_frame
-            utils.set_frame_fast(cur_frame)
+        # Single sweep for all rigs: collect the line of sight locations, 
+        # and the world to local conversion of the eye targets at each frame
+        frames = np.arange(start_frame, end_frame + 1)
+        tail_locations = [np.empty((2, total_frames, 3)) for rig in rigs]
+        world_to_local = [np.empty((3, total_frames, 4, 4)) for rig in rigs]
+
+        # the eye targets of all rigs are converted together, see child_of_utils.ChildOfSolver.
+        # its matrices are memoized per frame, the pose isn't changed during the sweep so they stay valid
+        solver = child_of_utils.ChildOfSolver([bone for rig in rigs for bone in rig.bones[2:]])
+
+        with sampling_utils.get_frame_sampler([rig.obj for rig in rigs]) as sampler:
+            for i in range(total_frames):
+                cur_frame = i + start_frame
+                sampler.set_frame(cur_frame)
 
-            left_location = utils.get_world_position_of_pose_bone_tail(bones["x_final_line_of_sight.l"])
-            right_location = utils.get_world_position_of_pose_bone_tail(bones["x_final_line_of_sight.r"])
+                solver_matrices = solver.get_world_to_local_matrices()
 
-            central_location = (left_location + right_location) * 0.5
-            # Store data as a tuple
-            frame_data.append((cur_frame, left_location, right_location, central_location))
+                for r, (rig, rig_tail_locations, rig_world_to_local) in enumerate(zip(rigs, tail_locations, world_to_local)):
+                    line_of_sight_l, line_of_sight_r = rig.bones[:2]
 
-            ui_utils.default_progress_update(i, total_frames)
+                    rig_tail_locations[0, i] = utils.get_world_position_of_pose_bone_tail(line_of_sight_l)
+                    rig_tail_locations[1, i] = utils.get_world_position_of_pose_bone_tail(line_of_sight_r)
 
-        # Second loop: Set locations based on collected data
-        for i, (cur_frame, left_location, right_location, central_location) in enumerate(frame_data):
-            
-            utils.set_frame_fast(cur_frame)
+                    rig_world_to_local[:, i] = solver_matrices[3 * r:3 * r + 3]
 
-            utils.set_bone_position(bones["c_x_eye_target.x"], central_location, world_space=True, key=True)
-            utils.set_bone_position(bones["c_x_eye_target.l"], left_location, world_space=True, key=True)
-            utils.set_bone_position(bones["c_x_eye_target.r"], right_location, world_space=True, key=True)
+                ui_utils.default_progress_update(i, total_frames)
 
-            ui_utils.default_progress_update(i, total_frames)
+        # Convert all frames at once and write the curves in bulk, per rig
+        for rig, (left_locations, right_locations), rig_world_to_local in zip(rigs, tail_locations, world_to_local):
+            central_locations = array_utils.lerp_vectors(left_locations, right_locations, 0.5)
+
+            world_locations = np.stack([central_locations, left_locations, right_locations])
+
+            locations = list(array_utils.transform_points(rig_world_to_local, world_locations))
+
+            write_bones_location(rig.obj, rig.bones[2:], locations, frames)
 
         ui_utils.default_progress_end()
 
@@ -169,6 +334,10 @@ class X_ANIM_OT_final_line_of_sight_to_eye_target(Operator):
 
         row.prop(props, "start_frame")
         row.prop(props, "end_frame")
+
+        row = layout.row()
+
+        row.prop(props, "all_selected")
     
     def invoke(self, context, event):
         return context.window_manager.invoke_props_dialog(self)
@@ -190,34 +359,28 @@ class X_ANIM_OT_eye_distance_to_convergence(Operator):
     def execute(self, context: Context):
 
         props = bpy.context.scene.x_anim_eye_utils
-        start_frame = props.start_frame
-        end_frame = props.end_frame
-        total_frames = int(end_frame - start_frame + 1)
 
-        bones = bpy.context.view_layer.objects.active.pose.bones
-
-        ui_utils.default_progress_begin()
+        rigs = resolve_eye_rigs(self, ['eye_l', 'eye_r', 'eye_convergence_slider'])
+        if not rigs:
+            return {'CANCELLED'}
 
-        # bake the curve to ensure that the evaluated values of subsequent frames 
-        # are not affected by inserting new frames
-        # add 1 keyframe before start and after end to protect the curve outside the given frame range
-        bones_bake(['c_eye.L', 'c_eye.R', 'c_eye_convergence_slider'], start_frame - 1, end_frame + 1, ui_utils.default_progress_update)
+        # sample first, the curves are written only after all frames are evaluated
+        frames, in_range = get_protected_frames(props.start_frame, props.end_frame)
 
-        for i in range(total_frames):
+        ui_utils.default_progress_begin()
 
-            cur_frame = i + start_frame
-            #bpy.context.scene.frame_set(cur_frame)
-            utils.set_frame_fast(cur_frame)
+        all_locations = sample_bones_location(rigs, frames, ui_utils.default_progress_update)
 
-            convergence = (-bones['c_eye.L'].location.x + bones['c_eye.R'].location.x) / 10.0 # 10 = 5 * 2, 5 is the most each c_eye can move
+        for rig, locations in zip(rigs, all_locations):
+            left, right, slider = locations
 
-            bones['c_eye_convergence_slider'].location.y = convergence * 4.0
-            bones['c_eye.L'].location.x = 0
-            bones['c_eye.R'].location.x = 0
+            convergence = (-left[in_range, 0] + right[in_range, 0]) / (rig.profile.eye_range * 2.0)
 
-            bones_insert_keyframe(['c_eye.L', 'c_eye.R', 'c_eye_convergence_slider'], cur_frame)
+            slider[in_range, 1] = convergence * rig.profile.convergence_range
+            left[in_range, 0] = 0
+            right[in_range, 0] = 0
 
-            ui_utils.default_progress_update(i, total_frames)
+            write_bones_location(rig.obj, rig.bones, locations, frames)
 
         ui_utils.default_progress_end()
 
@@ -232,6 +395,10 @@ class X_ANIM_OT_eye_distance_to_convergence(Operator):
 
         row.prop(props, "start_frame")
         row.prop(props, "end_frame")
+
+        row = layout.row()
+
+        row.prop(props, "all_selected")
     
     def invoke(self, context, event):
         return context.window_manager.invoke_props_dialog(self)
@@ -249,34 +416,102 @@ class X_ANIM_OT_eye_target_distance_to_convergence(Operator):
     def execute(self, context: Context):
 
         props = bpy.context.scene.x_anim_eye_utils
-        start_frame = props.start_frame
-        end_frame = props.end_frame
-        total_frames = int(end_frame - start_frame + 1)
 
-        bones = bpy.context.view_layer.objects.active.pose.bones
+        rigs = resolve_eye_rigs(self, ['eye_target_l', 'eye_target_r', 'eye_target_convergence_slider'])
+        if not rigs:
+            return {'CANCELLED'}
+
+        # sample first, the curves are written only after all frames are evaluated
+        frames, in_range = get_protected_frames(props.start_frame, props.end_frame)
 
         ui_utils.default_progress_begin()
 
-        # bake the curve to ensure that the evaluated values of subsequent frames 
-        # are not affected by inserting new frames
-        # add 1 keyframe before start and after end to protect the curve outside the given frame range
-        bones_bake(['c_x_eye_target.l', 'c_x_eye_target.r', 'c_eye_target_convergence_slider'], start_frame - 1, end_frame + 1, ui_utils.default_progress_update)
+        all_locations = sample_bones_location(rigs, frames, ui_utils.default_progress_update)
+
+        for rig, locations in zip(rigs, all_locations):
+            left, right, slider = locations
+
+            convergence = (-left[in_range, 0] + right[in_range, 0]) / (rig.profile.eye_target_range * 2.0)
+
+            slider[in_range, 1] = convergence * rig.profile.convergence_range
+            left[in_range, 0] = 0
+            right[in_range, 0] = 0
+
+            write_bones_location(rig.obj, rig.bones, locations, frames)
+
+        ui_utils.default_progress_end()
+
+        return {'FINISHED'}
+    
+    def draw(self, context):
+        layout = self.layout
+
+        props = bpy.context.scene.x_anim_eye_utils
+
+        row = layout.row()
+
+        row.prop(props, "start_frame")
+        row.prop(props, "end_frame")
+
+        row = layout.row()
+
+        row.prop(props, "all_selected")
+    
+    def invoke(self, context, event):
+        return context.window_manager.invoke_props_dialog(self)
+
+
+##
+## Smoothing
+##
+
+class X_ANIM_OT_smooth_eye_curves(Operator):
+    bl_idname = "x_anim.smooth_eye_curves"
+    bl_label = "Smooth Eye Curves"
+    bl_description = "Remove the mocap noise of the eye controls with a Savitzky-Golay filter, keeping the sharp jumps of saccades"
+    bl_options = {'REGISTER', 'UNDO'}
 
-        for i in range(total_frames):
+    controls : bpy.props.EnumProperty(name="Controls", items=[
+        ('EYES', "Eyes", "Eye L / R of the eye rig profile"),
+        ('EYE_TARGETS', "Eye Targets", "Eye Target L / R of the eye rig profile"),
+    ], default='EYES')
+    window : bpy.props.IntProperty(name="Window", default=9, min=3, description="Frames of the smoothing window, odd, larger is smoother")
+    order : bpy.props.IntProperty(name="Order", default=2, min=1, max=6, description="Order of the polynomial fitted in the window, higher keeps more detail")
+    saccade_threshold : bpy.props.FloatProperty(name="Saccade Threshold", default=0.5, min=0.0, description="Moving more than this in one frame is a saccade, the curves are smoothed separately on each side of it")
+
+    @classmethod
+    def poll(cls, context):
+        return True
+
+    def execute(self, context: Context):
+
+        props = bpy.context.scene.x_anim_eye_utils
+
+        roles = ['eye_l', 'eye_r'] if self.controls == 'EYES' else ['eye_target_l', 'eye_target_r']
+
+        rigs = resolve_eye_rigs(self, roles)
+        if not rigs:
+            return {'CANCELLED'}
+
+        window = self.window if self.window % 2 else self.window + 1
+
+        # sample first, the curves are written only after all frames are evaluated
+        frames, in_range = get_protected_frames(props.start_frame, props.end_frame)
+
+        ui_utils.default_progress_begin()
 
-            cur_frame = i + start_frame
-            #bpy.context.scene.frame_set(cur_frame)
-            utils.set_frame_fast(cur_frame)
+        all_locations = sample_bones_location(rigs, frames, ui_utils.default_progress_update)
 
-            convergence = (-bones['c_x_eye_target.l'].location.x + bones['c_x_eye_target.r'].location.x) / 6.4 # 6.4 = 3.2 * 2, 3.2 is the most each c_x_eye_target can move
+        for rig, locations in zip(rigs, all_locations):
+            # both eyes jump together, the saccades are detected on (frames, 6)
+            values = np.concatenate([bone_locations[in_range] for bone_locations in locations], axis=1)
 
-            bones['c_eye_target_convergence_slider'].location.y = convergence * 4.0
-            bones['c_x_eye_target.l'].location.x = 0
-            bones['c_x_eye_target.r'].location.x = 0
+            smoothed = array_utils.smooth_preserving_saccades(values, window, self.order, self.saccade_threshold)
 
-            bones_insert_keyframe(['c_x_eye_target.l', 'c_x_eye_target.r', 'c_eye_target_convergence_slider'], cur_frame)
+            for i, bone_locations in enumerate(locations):
+                bone_locations[in_range] = smoothed[:, i * 3:i * 3 + 3]
 
-            ui_utils.default_progress_update(i, total_frames)
+            write_bones_location(rig.obj, rig.bones, locations, frames)
 
         ui_utils.default_progress_end()
 
@@ -291,6 +526,286 @@ class X_ANIM_OT_eye_target_distance_to_convergence(Operator):
 
         row.prop(props, "start_frame")
         row.prop(props, "end_frame")
+
+        row = layout.row()
+        row.prop(self, "controls")
+        row = layout.row()
+        row.prop(self, "window")
+        row.prop(self, "order")
+        row = layout.row()
+        row.prop(self, "saccade_threshold")
+
+        row = layout.row()
+
+        row.prop(props, "all_selected")
+    
+    def invoke(self, context, event):
+        return context.window_manager.invoke_props_dialog(self)
+
+##
+## Live mode
+##
+## instead of baking, the eye controls are driven by x_anim_eye_live(), a python driver function
+## computing center and convergence from the keys of the eye controls at the current frame,
+## so editing the keys of c_eye.L/R shows up immediately. Freeze writes the same values as keys.
+## the values are read from the active action, python drivers need Auto Run Python Scripts
+##
+
+LIVE_DRIVER_FUNCTION = "x_anim_eye_live"
+
+# (armature name, frame) -> {role: np.array of shape (1, 3)}, shared by all the drivers of a rig,
+# cleared on every depsgraph update so edited keys are picked up, and on frame change so it doesn't grow during playback
+live_cache = {}
+LIVE_CACHE_SIZE = 64
+
+def get_live_channels(center, convergence) -> list:
+    """
+    [(role, location index)] driven in live mode
+    """
+
+    channels = []
+    if center:
+        channels += [(role, i) for role in ['eye_l', 'eye_r', 'eye_lookat'] for i in range(3)]
+    if convergence:
+        channels += [(role, i) for role, i in [('eye_l', 0), ('eye_r', 0), ('eye_convergence_slider', 1)] if (role, i) not in channels]
+    return channels
+
+def get_live_roles(center, convergence) -> list:
+    roles = ['eye_l', 'eye_r']
+    if center:
+        roles.append('eye_lookat')
+    if convergence:
+        roles.append('eye_convergence_slider')
+    return roles
+
+def sample_live_sources(obj, bones : dict, channels : list, frames) -> dict:
+    """
+    {role: np.array of shape (len(frames), 3)}, the keyed locations of the given bones, evaluated from the active action.
+    driven channels without keys count as 0, the driven value isn't a source
+    """
+
+    fcurve_sampler = fcurve_utils.FCurveSampler(obj)
+
+    locations = {}
+    for role, bone in bones.items():
+        data_path = bone.path_from_id('location')
+        locations[role] = np.stack([fcurve_sampler.sample(data_path, i, frames, 0.0 if (role, i) in channels else None) for i in range(3)], axis=1)
+
+    return locations
+
+def apply_live(locations : dict, profile, center, convergence, in_range=slice(None)):
+    """
+    Same as X_ANIM_OT_center_eye_lookat then X_ANIM_OT_eye_distance_to_convergence, in place
+    """
+
+    left = locations['eye_l']
+    right = locations['eye_r']
+
+    if center:
+        center_locations = (left[in_range] + right[in_range]) / 2.0
+
+        left[in_range] -= center_locations
+        right[in_range] -= center_locations
+        locations['eye_lookat'][in_range] = center_locations
+
+    if convergence:
+        convergence_values = (-left[in_range, 0] + right[in_range, 0]) / (profile.eye_range * 2.0)
+
+        locations['eye_convergence_slider'][in_range, 1] = convergence_values * profile.convergence_range
+        left[in_range, 0] = 0
+        right[in_range, 0] = 0
+
+def eye_live_driver(pose_bone, role, index, frame):
+    """
+    The driver function, self is the driven pose bone, an evaluated copy:
+    the keys are read from the original armature and action, whose fcurve index is cached
+    """
+
+    obj = pose_bone.id_data.original
+    key = (obj.name, frame)
+
+    locations = live_cache.get(key)
+    if locations is None:
+        object_props = obj.x_anim_eye_utils
+        profile = get_eye_rig_profile(obj)
+        center, convergence = object_props.live_center, object_props.live_convergence
+
+        roles = get_live_roles(center, convergence)
+        bones, missing = resolve_eye_bones(obj, profile, roles)
+        if missing:
+            return 0.0
+
+        locations = sample_live_sources(obj, dict(zip(roles, bones)), get_live_channels(center, convergence), [frame])
+        apply_live(locations, profile, center, convergence)
+
+        if len(live_cache) >= LIVE_CACHE_SIZE:
+            live_cache.clear()
+        live_cache[key] = locations
+
+    return float(locations[role][0, index])
+
+def remove_live_drivers(obj):
+    animation_data = obj.animation_data
+    if animation_data is not None:
+        for fcurve in [fcurve for fcurve in animation_data.drivers if fcurve.driver.expression.startswith(LIVE_DRIVER_FUNCTION)]:
+            animation_data.drivers.remove(fcurve)
+
+    obj.x_anim_eye_utils.live_center = False
+    obj.x_anim_eye_utils.live_convergence = False
+
+def register_live_driver_function():
+    bpy.app.driver_namespace[LIVE_DRIVER_FUNCTION] = eye_live_driver
+
+@persistent
+def eye_live_load_post(*args):
+    live_cache.clear()
+    register_live_driver_function()
+
+@persistent
+def eye_live_depsgraph_update_post(*args):
+    live_cache.clear()
+
+@persistent
+def eye_live_frame_change_post(*args):
+    live_cache.clear()
+
+def can_run_python_drivers() -> bool:
+    """
+    False when python drivers are blocked: Auto Run Python Scripts is off, or the file isn't trusted
+    """
+
+    return bpy.context.preferences.filepaths.use_scripts_auto_execute and not bpy.app.autoexec_fail
+
+class X_ANIM_OT_eye_live_enable(Operator):
+    bl_idname = "x_anim.eye_live_enable"
+    bl_label = "Live Center / Convergence"
+    bl_description = "Drive the eye controls with the centered / converged values of their keys, instead of baking them"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    center : bpy.props.BoolProperty(name="Center", default=True, description="Live Center c_eye_lookat")
+    convergence : bpy.props.BoolProperty(name="Convergence", default=True, description="Live Eye Distance → Convergence")
+
+    @classmethod
+    def poll(cls, context):
+        return True
+
+    def execute(self, context: Context):
+
+        if not self.center and not self.convergence:
+            self.report({'WARNING'}, "Nothing to drive")
+            return {'CANCELLED'}
+
+        rigs = resolve_eye_rigs(self, get_live_roles(self.center, self.convergence))
+        if not rigs:
+            return {'CANCELLED'}
+
+        register_live_driver_function()
+        live_cache.clear()
+
+        for rig in rigs:
+            remove_live_drivers(rig.obj)
+
+            bones = dict(zip(get_live_roles(self.center, self.convergence), rig.bones))
+
+            for role, index in get_live_channels(self.center, self.convergence):
+                driver = bones[role].driver_add('location', index).driver
+                driver.type = 'SCRIPTED'
+                driver.use_self = True
+                driver.expression = f'{LIVE_DRIVER_FUNCTION}(self, "{role}", {index}, frame)'
+
+            rig.obj.x_anim_eye_utils.live_center = self.center
+            rig.obj.x_anim_eye_utils.live_convergence = self.convergence
+
+        # the drivers are installed anyway, they start working once the file is trusted
+        if not can_run_python_drivers():
+            self.report({'WARNING'}, "Python drivers are blocked, enable Auto Run Python Scripts or trust this file, the eyes won't follow their keys until then")
+
+        return {'FINISHED'}
+    
+    def draw(self, context):
+        layout = self.layout
+
+        props = bpy.context.scene.x_anim_eye_utils
+
+        row = layout.row()
+
+        row.prop(self, "center")
+        row.prop(self, "convergence")
+
+        row = layout.row()
+
+        row.prop(props, "all_selected")
+    
+    def invoke(self, context, event):
+        return context.window_manager.invoke_props_dialog(self)
+
+class X_ANIM_OT_eye_live_disable(Operator):
+    bl_idname = "x_anim.eye_live_disable"
+    bl_label = "Remove Live Drivers"
+    bl_description = "Remove the live center / convergence drivers, the keys are left as they are"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    @classmethod
+    def poll(cls, context):
+        return True
+
+    def execute(self, context: Context):
+
+        for obj in get_eye_rig_objects(self):
+            remove_live_drivers(obj)
+
+        return {'FINISHED'}
+
+class X_ANIM_OT_eye_live_freeze(Operator):
+    bl_idname = "x_anim.eye_live_freeze"
+    bl_label = "Freeze Live To Keys"
+    bl_description = "Write the live center / convergence values as keys in the frame range, and remove the live drivers"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    @classmethod
+    def poll(cls, context):
+        return True
+
+    def execute(self, context: Context):
+
+        props = bpy.context.scene.x_anim_eye_utils
+
+        frames, in_range = get_protected_frames(props.start_frame, props.end_frame)
+
+        for obj in get_eye_rig_objects(self):
+            object_props = obj.x_anim_eye_utils
+            center, convergence = object_props.live_center, object_props.live_convergence
+            if not center and not convergence:
+                continue
+
+            roles = get_live_roles(center, convergence)
+            rig = resolve_eye_rig(self, obj, roles)
+            if rig is None:
+                continue
+
+            # everything is computed from the keys, the drivers can be removed before writing
+            locations = sample_live_sources(obj, dict(zip(roles, rig.bones)), get_live_channels(center, convergence), frames)
+            apply_live(locations, rig.profile, center, convergence, in_range)
+
+            remove_live_drivers(obj)
+
+            write_bones_location(obj, rig.bones, [locations[role] for role in roles], frames)
+
+        return {'FINISHED'}
+    
+    def draw(self, context):
+        layout = self.layout
+
+        props = bpy.context.scene.x_anim_eye_utils
+
+        row = layout.row()
+
+        row.prop(props, "start_frame")
+        row.prop(props, "end_frame")
+
+        row = layout.row()
+
+        row.prop(props, "all_selected")
     
     def invoke(self, context, event):
         return context.window_manager.invoke_props_dialog(self)
@@ -302,6 +817,7 @@ class X_ANIM_OT_eye_target_distance_to_convergence(Operator):
 
 
 class x_anim_PT_eye_utils(Panel):
+    bl_idname = "x_anim_PT_eye_utils"
     bl_space_type = "VIEW_3D"
     bl_region_type = "UI"
     bl_category = "x anim"
@@ -313,7 +829,7 @@ class x_anim_PT_eye_utils(Panel):
 
         row = layout.row()
 
-        row.label(text="Faster if only the face rig enabled in scene")
+        row.prop(props, "isolate_sampling")
 
         row = layout.row()
         ui_utils.default_operator_button(row, X_ANIM_OT_center_eye_lookat)
@@ -323,6 +839,58 @@ class x_anim_PT_eye_utils(Panel):
         ui_utils.default_operator_button(row, X_ANIM_OT_eye_distance_to_convergence)
         row = layout.row()
         ui_utils.default_operator_button(row, X_ANIM_OT_eye_target_distance_to_convergence)
+        row = layout.row()
+        ui_utils.default_operator_button(row, X_ANIM_OT_smooth_eye_curves)
+
+        obj = bpy.context.view_layer.objects.active
+        if obj is not None and obj.type == 'ARMATURE':
+            object_props = obj.x_anim_eye_utils
+            row = layout.row()
+            live_modes = [name for name, enabled in [("Center", object_props.live_center), ("Convergence", object_props.live_convergence)] if enabled]
+            row.label(text="Live: " + (", ".join(live_modes) or "Off"))
+            if live_modes and not can_run_python_drivers():
+                row = layout.row()
+                row.label(text="Python drivers are blocked", icon='ERROR')
+
+        row = layout.row()
+        ui_utils.default_operator_button(row, X_ANIM_OT_eye_live_enable)
+        row = layout.row()
+        ui_utils.default_operator_button(row, X_ANIM_OT_eye_live_freeze)
+        ui_utils.default_operator_button(row, X_ANIM_OT_eye_live_disable)
+
+class x_anim_PT_eye_rig_profile(Panel):
+    bl_space_type = "VIEW_3D"
+    bl_region_type = "UI"
+    bl_category = "x anim"
+    bl_label = "Eye Rig Profile"
+    bl_parent_id = "x_anim_PT_eye_utils"
+    bl_options = {'DEFAULT_CLOSED'}
+
+    def draw(self, context):
+        layout = self.layout
+
+        obj = bpy.context.view_layer.objects.active
+        pose = obj.pose if obj is not None and obj.type == 'ARMATURE' else None
+
+        if pose is not None:
+            row = layout.row()
+            row.prop(obj.x_anim_eye_utils, "use_own_profile", text=f"Own Profile for {obj.name}")
+
+        profile = get_eye_rig_profile(obj)
+
+        for role in EYE_RIG_BONE_ROLES:
+            row = layout.row()
+            if pose is not None:
+                row.prop_search(profile, role, pose, "bones")
+            else:
+                row.prop(profile, role)
+
+        row = layout.row()
+        row.prop(profile, "eye_range")
+        row = layout.row()
+        row.prop(profile, "eye_target_range")
+        row = layout.row()
+        row.prop(profile, "convergence_range")
 
 #
 # register
@@ -330,6 +898,18 @@ class x_anim_PT_eye_utils(Panel):
 
 def register():
     bpy.types.Scene.x_anim_eye_utils = bpy.props.PointerProperty(type=x_anim_eye_utils_properties)
+    bpy.types.Object.x_anim_eye_utils = bpy.props.PointerProperty(type=x_anim_eye_utils_object_properties)
+
+    register_live_driver_function()
+    bpy.app.handlers.load_post.append(eye_live_load_post)
+    bpy.app.handlers.depsgraph_update_post.append(eye_live_depsgraph_update_post)
+    bpy.app.handlers.frame_change_post.append(eye_live_frame_change_post)
 
 def unregister():
-    del bpy.types.Scene.x_anim_eye_utils
\ No newline at end of file
+    bpy.app.handlers.frame_change_post.remove(eye_live_frame_change_post)
+    bpy.app.handlers.depsgraph_update_post.remove(eye_live_depsgraph_update_post)
+    bpy.app.handlers.load_post.remove(eye_live_load_post)
+    bpy.app.driver_namespace.pop(LIVE_DRIVER_FUNCTION, None)
+
+    del bpy.types.Scene.x_anim_eye_utils
+    del bpy.types.Object.x_anim_eye_utils
\ No newline at end of file
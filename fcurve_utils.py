@@ -0,0 +1,357 @@
+import re
+import bpy
+import math
+import numpy as np
+from bpy.app.handlers import persistent
+
+#
+# parsed index over the fcurves of an action
+#
+
+
+POSE_BONE_DATA_PATH = re.compile(r'^pose\.bones\["((?:[^"\\]|\\.)*)"\]\.(.+)$')
+
+
+def parse_pose_bone_data_path(data_path):
+	'''	'pose.bones["name"].location' -> ('name', 'location'),
+		'pose.bones["name"].constraints["c"].influence' -> ('name', 'constraints["c"].influence'),
+		None if data_path doesn't belong to a pose bone
+	'''
+
+	match = POSE_BONE_DATA_PATH.match(data_path)
+	if match is None:
+		return None
+
+	bone_name = re.sub(r'\\(.)', r'\1', match.group(1))
+	return bone_name, match.group(2)
+
+
+class FCurveIndex:
+	'''	(bone name, property path, array index) -> fcurve and (data path, array index) -> fcurve,
+		built in one pass over action.fcurves.
+		property path is relative to the pose bone, see parse_pose_bone_data_path.
+		the keyed frames of each fcurve are read on first use and kept as sorted arrays,
+		until the key count changes or forget_keyed_frames is called.
+		use get_fcurve_index to share one index per action instead of building a new one
+	'''
+
+	def __init__(self, action):
+		self.action = action
+		self.fcurves = {} # (bone name, property path, array index) -> fcurve
+		self.bone_fcurves = {} # bone name -> [(property path, array index, fcurve)]
+		self.data_paths = {} # (data path, array index) -> fcurve
+		self.keyed_frames = {} # (data path, array index) -> (key count, sorted frames, truncated frames)
+		self.fcurve_count = len(action.fcurves)
+
+		for fcurve in action.fcurves:
+			self.data_paths[(fcurve.data_path, fcurve.array_index)] = fcurve
+
+			parsed = parse_pose_bone_data_path(fcurve.data_path)
+			if parsed is None:
+				continue
+
+			bone_name, prop = parsed
+			self.fcurves[(bone_name, prop, fcurve.array_index)] = fcurve
+			self.bone_fcurves.setdefault(bone_name, []).append((prop, fcurve.array_index, fcurve))
+
+	def add(self, fcurve):
+		'''	register an fcurve just created in the action, so the index stays valid '''
+
+		self.data_paths[(fcurve.data_path, fcurve.array_index)] = fcurve
+		self.fcurve_count += 1
+
+		parsed = parse_pose_bone_data_path(fcurve.data_path)
+		if parsed is not None:
+			bone_name, prop = parsed
+			self.fcurves[(bone_name, prop, fcurve.array_index)] = fcurve
+			self.bone_fcurves.setdefault(bone_name, []).append((prop, fcurve.array_index, fcurve))
+
+	def forget_keyed_frames(self, fcurve):
+		'''	the keyframes of fcurve were edited, they are read again on next use '''
+		self.keyed_frames.pop((fcurve.data_path, fcurve.array_index), None)
+
+	def is_valid(self):
+		'''	False once fcurves were added to or removed from the action, the index has to be rebuilt '''
+		return len(self.action.fcurves) == self.fcurve_count
+
+	def find(self, bone_name, prop, index=0):
+		return self.fcurves.get((bone_name, prop, index))
+
+	def find_data_path(self, data_path, index=0):
+		'''	same as action.fcurves.find, without the linear search '''
+		return self.data_paths.get((data_path, index))
+
+	def get_bone_fcurves(self, bone_name):
+		'''	[(property path, array index, fcurve)] of the given bone '''
+		return self.bone_fcurves.get(bone_name, [])
+
+	def get_frames(self, fcurve):
+		key = (fcurve.data_path, fcurve.array_index)
+		count = len(fcurve.keyframe_points)
+
+		# the shared index is rebuilt when the depsgraph updates the action, in between,
+		# keys inserted or deleted by a script change the count, keys moved in place need forget_keyed_frames
+		cached = self.keyed_frames.get(key)
+		if cached is None or cached[0] != count:
+			co = np.empty(count * 2)
+			fcurve.keyframe_points.foreach_get('co', co)
+			frames = np.unique(co[0::2])
+			cached = self.keyed_frames[key] = (count, frames, np.trunc(frames))
+
+		return cached
+
+	def get_keyed_frames(self, fcurve):
+		'''	sorted frames of the keyframes of fcurve '''
+		return self.get_frames(fcurve)[1]
+
+	def has_keyframe(self, fcurve, frame):
+		'''	True if fcurve has a key on frame, subframe keys count for the frame they are on (int(frame)) '''
+
+		truncated = self.get_frames(fcurve)[2]
+		i = np.searchsorted(truncated, frame)
+		return bool(i < len(truncated) and truncated[i] == frame)
+
+
+def get_keyed_frames(fcurves):
+	'''	sorted, deduplicated frames of the keyframes of the given fcurves, as a numpy array '''
+
+	frames = [np.empty(0)]
+	for fcurve in fcurves:
+		co = np.empty(len(fcurve.keyframe_points) * 2)
+		fcurve.keyframe_points.foreach_get('co', co)
+		frames.append(co[0::2])
+
+	return np.unique(np.concatenate(frames))
+
+
+def get_object_actions(obj):
+	'''	the active action and the actions of all NLA strips of obj, without duplicates '''
+
+	actions = []
+	animation_data = obj.animation_data
+	if animation_data is None:
+		return actions
+
+	if animation_data.action:
+		actions.append(animation_data.action)
+
+	for track in animation_data.nla_tracks:
+		for strip in track.strips:
+			if strip.action and strip.action not in actions:
+				actions.append(strip.action)
+
+	return actions
+
+
+####shared indices####
+#
+# one FCurveIndex per action, shared by every module querying animation data.
+# indices are keyed by the action's pointer, names aren't unique across libraries and change on rename.
+# when an action is updated its version is bumped, its index is rebuilt on next use.
+# armature objects have a version too, for caches built from their constraints (see switch_child_of_timeline).
+# fcurves added or removed by a script, before the depsgraph sees it, are caught by FCurveIndex.is_valid.
+# undo, redo and file loads free the actions, everything is dropped then.
+# evaluated (copy on write) actions are freed and copied again by the depsgraph at any time, they are never cached
+#
+
+index_cache = {} # action pointer -> (FCurveIndex, version when built)
+versions = {} # action or armature object pointer -> update count
+
+
+def get_action_key(action):
+	return action.original.as_pointer()
+
+
+def get_fcurve_index(action) -> FCurveIndex:
+	if action.is_evaluated:
+		return FCurveIndex(action)
+
+	key = get_action_key(action)
+	version = versions.get(key, 0)
+
+	cached = index_cache.get(key)
+	if cached is not None:
+		index, built_version = cached
+		try:
+			if built_version == version and index.is_valid():
+				return index
+		except ReferenceError:
+			# the action was removed and its memory reused by this one
+			pass
+
+	index = FCurveIndex(action)
+	index_cache[key] = (index, version)
+	return index
+
+
+def forget_keyed_frames(fcurve):
+	'''	FCurveIndex.forget_keyed_frames on the shared index of the fcurve's action, if there is one '''
+
+	cached = index_cache.get(get_action_key(fcurve.id_data))
+	if cached is not None:
+		cached[0].forget_keyed_frames(fcurve)
+
+
+def invalidate_fcurve_index(action):
+	'''	for scripts replacing fcurves (as many removed as added), before the depsgraph is updated '''
+	index_cache.pop(get_action_key(action), None)
+
+
+@persistent
+def fcurve_index_depsgraph_update_post(scene, depsgraph):
+	for update in depsgraph.updates:
+		id_data = update.id
+		if isinstance(id_data, bpy.types.Action) or (isinstance(id_data, bpy.types.Object) and id_data.type == 'ARMATURE'):
+			key = get_action_key(id_data)
+			versions[key] = versions.get(key, 0) + 1
+
+
+@persistent
+def fcurve_index_clear(*args):
+	index_cache.clear()
+	versions.clear()
+
+
+####sampling fcurves without the depsgraph####
+
+def nla_strip_frames_to_action_frames(strip, frames):
+	'''	scene frames -> frames of strip.action, same mapping as blender uses to evaluate an action strip
+		(action range, scale, repeat and reverse)
+	'''
+
+	frames = np.asarray(frames, dtype=np.float64)
+
+	scale = abs(strip.scale)
+	action_start = strip.action_frame_start
+	action_end = strip.action_frame_end
+	action_length = action_end - action_start
+	if action_length == 0.0:
+		action_length = 1.0
+
+	offset = np.fmod(frames - strip.frame_start, action_length * scale) / scale
+
+	# the last frame of a whole number of repeats is the end of the action, not its start
+	at_end = (frames == strip.frame_end) & (strip.repeat == math.floor(strip.repeat))
+
+	if strip.use_reverse:
+		return np.where(at_end, action_start, action_end - offset)
+	return np.where(at_end, action_end, action_start + offset)
+
+
+def is_fcurve_muted(fcurve):
+	'''	muted fcurves, and fcurves of a muted group, are skipped by blender when evaluating the action '''
+	return fcurve.mute or (fcurve.group is not None and fcurve.group.mute)
+
+
+def get_strip_influences(strip, frames):
+	'''	animated influence of an NLA strip at the given frames, its current influence if it has no influence fcurve '''
+
+	fcurve = strip.fcurves.find('influence')
+	if fcurve is None or fcurve.mute:
+		return np.full(len(frames), strip.influence)
+	return np.array([fcurve.evaluate(frame) for frame in frames])
+
+
+class FCurveSampler:
+	'''	evaluates channels of obj straight from the fcurves of its action, without stepping frames
+		or updating the depsgraph. 
+		only valid for channels where can_sample() is True, that is when the value of the property
+		only comes from the action (or the strip being tweaked): no driver, no NLA blending.
+		constraints don't matter, they don't change the property values.
+	'''
+
+	def __init__(self, obj):
+		self.obj = obj
+		self.action = None
+		self.strip = None # the strip in tweak mode, its time mapping is applied
+		self.fcurve_index = None
+
+		animation_data = obj.animation_data
+		if animation_data is None:
+			return
+
+		self.action = animation_data.action
+		if self.action is not None:
+			self.fcurve_index = get_fcurve_index(self.action)
+
+		if animation_data.use_tweak_mode:
+			for track in animation_data.nla_tracks:
+				for strip in track.strips:
+					if strip.active and strip.action == self.action:
+						self.strip = strip
+
+	def can_sample(self, channels, frames):
+		'''	channels: [(data_path, array_index)] '''
+
+		animation_data = self.obj.animation_data
+		if animation_data is None:
+			return True
+
+		channels = set(channels)
+
+		# drivers override the animation
+		for driver in animation_data.drivers:
+			if (driver.data_path, driver.array_index) in channels:
+				return False
+
+		# the active action must replace whatever is below it
+		if self.action is not None:
+			if self.strip is None:
+				if animation_data.action_blend_type != 'REPLACE' or animation_data.action_influence < 1.0:
+					return False
+			else:
+				if self.strip.blend_type != 'REPLACE':
+					return False
+				if self.strip.use_animated_influence and np.any(get_strip_influences(self.strip, frames) < 1.0):
+					return False
+				if min(frames) < self.strip.frame_start or max(frames) > self.strip.frame_end:
+					return False
+
+		# no other strip may animate the channels
+		if animation_data.use_nla or animation_data.use_tweak_mode:
+			for track in animation_data.nla_tracks:
+				if track.mute:
+					continue
+				for strip in track.strips:
+					if strip == self.strip or strip.mute or strip.action is None:
+						continue
+					for fcurve in strip.action.fcurves:
+						if (fcurve.data_path, fcurve.array_index) in channels and not is_fcurve_muted(fcurve):
+							return False
+
+		return True
+
+	def sample(self, data_path, index, frames, default=None):
+		'''	values of obj.path_resolve(data_path)[index] at the given frames, as a numpy array.
+			default: value of channels that aren't animated, the current property value if None
+		'''
+
+		frames = np.asarray(frames, dtype=np.float64)
+
+		fcurve = None
+		if self.action is not None:
+			fcurve = self.fcurve_index.find_data_path(data_path, index)
+
+		# not animated, the property keeps its value
+		if fcurve is None or is_fcurve_muted(fcurve):
+			if default is None:
+				default = self.obj.path_resolve(data_path)[index]
+			return np.full(len(frames), default)
+
+		if self.strip is not None:
+			frames = nla_strip_frames_to_action_frames(self.strip, frames)
+
+		return np.array([fcurve.evaluate(frame) for frame in frames])
+
+
+def register():
+	bpy.app.handlers.depsgraph_update_post.append(fcurve_index_depsgraph_update_post)
+	bpy.app.handlers.load_post.append(fcurve_index_clear)
+	bpy.app.handlers.undo_post.append(fcurve_index_clear)
+	bpy.app.handlers.redo_post.append(fcurve_index_clear)
+
+def unregister():
+	bpy.app.handlers.redo_post.remove(fcurve_index_clear)
+	bpy.app.handlers.undo_post.remove(fcurve_index_clear)
+	bpy.app.handlers.load_post.remove(fcurve_index_clear)
+	bpy.app.handlers.depsgraph_update_post.remove(fcurve_index_depsgraph_update_post)
@@ -0,0 +1,2 @@
+# this is needed for auto_load.py to work
+# by xuxing
\ No newline at end of file
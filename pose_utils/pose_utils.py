@@ -0,0 +1,330 @@
+import bpy
+import mathutils
+import numpy as np
+from collections import OrderedDict
+from bpy.types import Context, Operator, Panel
+from .. import array_utils, fcurve_utils, ui_utils, utils
+
+#
+# util functions
+#
+
+# pose bone transform properties a pose can hold: (size, rest value)
+POSE_PROPS = {
+	'location': (3, (0.0, 0.0, 0.0)),
+	'rotation_quaternion': (4, (1.0, 0.0, 0.0, 0.0)),
+	'rotation_euler': (3, (0.0, 0.0, 0.0)),
+	'rotation_axis_angle': (4, (0.0, 0.0, 1.0, 0.0)),
+	'scale': (3, (1.0, 1.0, 1.0)),
+}
+
+
+ROTATION_PROPS = ['rotation_quaternion', 'rotation_euler', 'rotation_axis_angle']
+
+
+class PoseTable:
+	'''	bone -> transform table of a pose action, parsed once from its fcurves.
+		values[prop] is (bones, size), keyed[prop] tells which of those channels the pose has,
+		the others keep the bone's current value when the pose is applied.
+		each channel's value is its first keyframe, like utils.load_pose
+	'''
+
+	def __init__(self, action):
+		self.fcurve_index = fcurve_utils.get_fcurve_index(action)
+
+		self.bone_names = [bone_name for bone_name in self.fcurve_index.bone_fcurves
+			if any(prop in POSE_PROPS for prop, index, fcurve in self.fcurve_index.get_bone_fcurves(bone_name))]
+		self.bone_indices = {bone_name: i for i, bone_name in enumerate(self.bone_names)}
+
+		self.values = {prop: np.tile(rest, (len(self.bone_names), 1)) for prop, (size, rest) in POSE_PROPS.items()}
+		self.keyed = {prop: np.zeros((len(self.bone_names), size), dtype=bool) for prop, (size, rest) in POSE_PROPS.items()}
+
+		self.sources = [] # (fcurve, prop, row, array index) of each channel of the pose
+		for i, bone_name in enumerate(self.bone_names):
+			for prop, index, fcurve in self.fcurve_index.get_bone_fcurves(bone_name):
+				if prop not in POSE_PROPS or fcurve.mute or not len(fcurve.keyframe_points):
+					continue
+				self.sources.append((fcurve, prop, i, index))
+				self.keyed[prop][i, index] = True
+
+		self.signature = self.read_signature()
+
+		# the first keyframe of each channel, (frame, value) pairs start at the 2 * key count offsets
+		offsets = np.concatenate([[0], np.cumsum(self.signature[0][:-1])]).astype(int) * 2
+		for (fcurve, prop, i, index), offset in zip(self.sources, offsets):
+			self.values[prop][i, index] = self.signature[1][offset + 1]
+
+	def read_signature(self):
+		'''	(key counts, keyframe coordinates) of the channels of the pose, with one foreach_get per fcurve '''
+
+		counts = [len(fcurve.keyframe_points) for fcurve, prop, i, index in self.sources]
+		co = np.empty(sum(counts) * 2, dtype=np.float32)
+
+		offset = 0
+		for (fcurve, prop, i, index), count in zip(self.sources, counts):
+			fcurve.keyframe_points.foreach_get('co', co[offset:offset + count * 2])
+			offset += count * 2
+
+		return counts, co
+
+	def is_current(self):
+		'''	False if a key of the pose was added, removed or edited since it was parsed.
+			pose library actions aren't used by any object, they aren't in the depsgraph
+			so their fcurve index isn't rebuilt when they are edited
+		'''
+
+		counts, co = self.read_signature()
+		return counts == self.signature[0] and np.array_equal(co, self.signature[1])
+
+
+# parsed pose actions, least recently used first, switching between the poses of a library doesn't parse them again
+POSE_CACHE_SIZE = 16
+pose_cache = OrderedDict() # action pointer -> PoseTable
+
+
+def get_pose_table(action) -> PoseTable:
+	'''	the cached PoseTable of action, parsed again if the action changed since:
+		when its shared fcurve index was rebuilt (see fcurve_utils.get_fcurve_index), or a value of the pose changed
+	'''
+
+	key = fcurve_utils.get_action_key(action)
+
+	table = pose_cache.get(key)
+	if table is None or table.fcurve_index is not fcurve_utils.get_fcurve_index(action) or not table.is_current():
+		table = pose_cache[key] = PoseTable(action)
+
+	pose_cache.move_to_end(key)
+	while len(pose_cache) > POSE_CACHE_SIZE:
+		pose_cache.popitem(last=False)
+
+	return table
+
+
+def rotation_to_quaternion(prop, values, euler_order) -> mathutils.Quaternion:
+	'''	values of a rotation property as a quaternion '''
+
+	if prop == 'rotation_quaternion':
+		return mathutils.Quaternion(values).normalized()
+	if prop == 'rotation_axis_angle':
+		axis = mathutils.Vector(values[1:])
+		if axis.length == 0.0:
+			return mathutils.Quaternion()
+		return mathutils.Quaternion(axis.normalized(), values[0])
+	return mathutils.Euler(values, euler_order).to_quaternion()
+
+
+def quaternion_to_rotation(prop, quaternion, euler_order, current):
+	'''	quaternion as the values of a rotation property, as close as possible to its current values '''
+
+	if prop == 'rotation_quaternion':
+		if quaternion.dot(mathutils.Quaternion(current)) < 0.0:
+			quaternion = -quaternion
+		return list(quaternion)
+	if prop == 'rotation_axis_angle':
+		axis, angle = quaternion.to_axis_angle()
+		return [angle] + list(axis)
+	return list(quaternion.to_euler(euler_order, mathutils.Euler(current, euler_order)))
+
+
+def read_pose_bones_property(pose_bones, prop):
+	'''	(len(pose_bones), size) values of a transform property of all the bones, with a single foreach_get '''
+
+	size = POSE_PROPS[prop][0]
+	values = np.empty(len(pose_bones) * size, dtype=np.float32)
+	pose_bones.foreach_get(prop, values)
+	return values.reshape(-1, size).astype(np.float64)
+
+
+def apply_pose(obj, table : PoseTable, bone_names=None, factor=1.0, key=False):
+	'''	apply a parsed pose to the bones of obj in one pass per transform property,
+		all the bones of the pose, or only those in bone_names.
+		factor blends from the current pose (0) to the pose (1).
+		rotations are applied in each bone's own rotation mode, converted from the pose's if it differs,
+		and blended along the shortest path (slerp).
+		with key, the channels written are keyed on the current frame.
+		returns the number of bones posed
+	'''
+
+	pose_bones = obj.pose.bones
+
+	# pose bones of obj found in the pose, and their rows in the table
+	bone_rows = []
+	pose_rows = []
+	for i, pose_bone in enumerate(pose_bones):
+		row = table.bone_indices.get(pose_bone.name)
+		if row is None or (bone_names is not None and pose_bone.name not in bone_names):
+			continue
+		bone_rows.append(i)
+		pose_rows.append(row)
+
+	if not bone_rows:
+		return 0
+
+	current = {} # prop -> values of all the bones, read and written back at once
+	written = {} # prop -> bool (bones, size), channels to key
+
+	# location and scale, blended linearly
+	for prop in ('location', 'scale'):
+		keyed = table.keyed[prop][pose_rows]
+		if not keyed.any():
+			continue
+
+		current[prop] = read_pose_bones_property(pose_bones, prop)
+		values = current[prop][bone_rows]
+		target = np.where(keyed, table.values[prop][pose_rows], values)
+
+		current[prop][bone_rows] = (1.0 - factor) * values + factor * target
+		written[prop] = keyed
+
+	# rotations, through quaternions, each bone keeps its rotation mode
+	rotated = [k for k, row in enumerate(pose_rows) if any(table.keyed[prop][row].any() for prop in ROTATION_PROPS)]
+	if rotated:
+		for prop in ROTATION_PROPS:
+			current[prop] = read_pose_bones_property(pose_bones, prop)
+			written[prop] = np.zeros((len(bone_rows), POSE_PROPS[prop][0]), dtype=bool)
+
+		bone_props = []
+		current_quaternions = np.empty((len(rotated), 4))
+		target_quaternions = np.empty((len(rotated), 4))
+
+		for j, k in enumerate(rotated):
+			pose_bone = pose_bones[bone_rows[k]]
+			row = pose_rows[k]
+
+			prop = utils.get_rotation_data_path(pose_bone)
+			euler_order = pose_bone.rotation_mode if prop == 'rotation_euler' else 'XYZ'
+
+			# the pose's rotation in the bone's mode if it has it, otherwise converted from the one it has
+			source = prop if table.keyed[prop][row].any() else next(p for p in ROTATION_PROPS if table.keyed[p][row].any())
+			source_values = np.where(table.keyed[source][row], table.values[source][row], current[source][bone_rows[k]])
+
+			# fully applied in the same mode, the pose's values are written as they are
+			bone_props.append((prop, euler_order, source_values if source == prop and factor >= 1.0 else None))
+
+			current_quaternions[j] = rotation_to_quaternion(prop, current[prop][bone_rows[k]], euler_order)
+			target_quaternions[j] = rotation_to_quaternion(source, source_values, euler_order)
+
+		blended = array_utils.slerp_quaternions(current_quaternions, target_quaternions, factor)
+
+		for j, k in enumerate(rotated):
+			prop, euler_order, pose_values = bone_props[j]
+			if pose_values is None:
+				pose_values = quaternion_to_rotation(prop, mathutils.Quaternion(blended[j]), euler_order, current[prop][bone_rows[k]])
+			current[prop][bone_rows[k]] = pose_values
+			written[prop][k] = True
+
+	for prop, values in current.items():
+		pose_bones.foreach_set(prop, values.astype(np.float32).ravel())
+
+	if key:
+		keys = {} # (data path, array index) -> (group, value)
+		for prop, channels in written.items():
+			for k, index in zip(*np.nonzero(channels)):
+				pose_bone = pose_bones[bone_rows[k]]
+				keys[(pose_bone.path_from_id(prop), int(index))] = (pose_bone.name, current[prop][bone_rows[k], index])
+
+		write_pose_keys(utils.get_or_create_action(obj), keys, bpy.context.scene.frame_current)
+
+	obj.update_tag()
+
+	return len(bone_rows)
+
+
+def write_pose_keys(action, keys : dict, frame):
+	'''	key {(data path, array index): (group, value)} on frame.
+		all the keys are inserted first without updating the curves, then each curve is updated once
+	'''
+
+	fcurves = []
+	for (data_path, index), (group, value) in keys.items():
+		fcurve = utils.get_or_create_fcurve(action, data_path, index=index, group=group)
+		fcurve.keyframe_points.insert(frame, value, options={'FAST'})
+		fcurves.append(fcurve)
+
+	for fcurve in fcurves:
+		fcurve.update()
+
+
+#
+# operators
+#
+
+##
+## apply pose
+##
+class x_anim_pose_utils_properties(bpy.types.PropertyGroup):
+	pose : bpy.props.PointerProperty(name="pose", description="Action holding the pose, one key per channel", type=bpy.types.Action)
+	factor : bpy.props.FloatProperty(name="factor", description="Blend from the current pose to the pose", default=1.0, min=0.0, max=1.0, subtype='FACTOR')
+	selected_only : bpy.props.BoolProperty(name="selected only", description="Only pose the selected bones, otherwise all the bones of the selected armatures", default=True)
+	key : bpy.props.BoolProperty(name="key", description="Key the channels of the pose on the current frame", default=False)
+
+class X_ANIM_OT_apply_pose(Operator):
+	bl_idname = "x_anim.apply_pose"
+	bl_label = "Apply Pose"
+	bl_description = "Apply the whole pose action to the armatures in pose mode, parsed once and cached"
+	bl_options = {'REGISTER', 'UNDO'}
+
+	@classmethod
+	def poll(cls, context):
+		return context.mode == 'POSE' and context.scene.x_anim_pose_utils.pose is not None
+
+	def execute(self, context: Context):
+
+		props = bpy.context.scene.x_anim_pose_utils
+
+		table = get_pose_table(props.pose)
+
+		if props.selected_only:
+			bone_names = {}
+			for pose_bone in context.selected_pose_bones or []:
+				bone_names.setdefault(pose_bone.id_data.name, set()).add(pose_bone.name)
+			armatures = [bpy.data.objects[name] for name in bone_names]
+		else:
+			bone_names = None
+			armatures = [obj for obj in context.objects_in_mode if obj.type == 'ARMATURE']
+
+		posed = 0
+		for obj in armatures:
+			posed += apply_pose(obj, table, bone_names[obj.name] if bone_names is not None else None, props.factor, props.key)
+
+		if posed == 0:
+			self.report({'WARNING'}, f"No bone of '{props.pose.name}' to pose")
+			return {'CANCELLED'}
+
+		self.report({'INFO'}, f"Posed {posed} bones")
+		return {'FINISHED'}
+
+#
+# panel
+#
+
+class X_ANIM_PT_pose_utils(Panel):
+	bl_space_type = "VIEW_3D"
+	bl_region_type = "UI"
+	bl_category = "x anim"
+	bl_label = "Pose Utils"
+
+	def draw(self, context):
+		layout = self.layout
+		props = bpy.context.scene.x_anim_pose_utils
+
+		row = layout.row()
+		row.prop(props, "pose")
+		row = layout.row()
+		row.prop(props, "factor")
+		row = layout.row()
+		row.prop(props, "selected_only")
+		row.prop(props, "key")
+
+		row = layout.row()
+		ui_utils.default_operator_button(row, X_ANIM_OT_apply_pose)
+
+#
+# register
+#
+
+def register():
+	bpy.types.Scene.x_anim_pose_utils = bpy.props.PointerProperty(type=x_anim_pose_utils_properties)
+
+def unregister():
+	del bpy.types.Scene.x_anim_pose_utils
@@ -10,4 +10,12 @@ def text_poll(self, object):
 #properties
 class x_anim_properties(bpy.types.PropertyGroup):
 
-    ...
\ No newline at end of file
+    isolate_sampling : bpy.props.BoolProperty(
+        name="Isolate Rig When Sampling",
+        description="When stepping frames for bakes, only evaluate the rig and what it depends on, instead of the whole scene",
+        default=True)
+
+    show_parent_timeline : bpy.props.BoolProperty(
+        name="Show Parent Timeline",
+        description="Draw which Child Of parent of the active bone is active over time, in the dope sheet and timeline",
+        default=False)
\ No newline at end of file
@@ -0,0 +1,146 @@
+import bpy
+from . import utils
+
+#
+# frame samplers
+#
+# step the timeline and evaluate the animation, so pose bones can be read at each frame.
+# use as context managers:
+#
+#	with sampling_utils.get_frame_sampler([armature]) as sampler:
+#		for frame in range(start_frame, end_frame + 1):
+#			sampler.set_frame(frame)
+#			... read armature.pose.bones
+#
+
+ISOLATION_NAME = "x_anim_sampling"
+
+
+class FrameSampler:
+	'''	set frame and update the depsgraph of the current view layer,
+		which evaluates everything that's enabled in the scene (see utils.set_frame_fast)
+	'''
+
+	def __init__(self, objects=None):
+		self.objects = list(objects) if objects else []
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		return False
+
+	def set_frame(self, frame):
+		utils.set_frame_fast(frame)
+
+
+class IsolatedFrameSampler(FrameSampler):
+	'''	set frame and only evaluate the given objects and what they depend on
+		(parents, constraint targets and driver targets), so the cost follows
+		the rig's complexity instead of the scene's.
+
+		this is done with a temporary view layer that excludes every collection,
+		except a temporary one holding those objects. evaluating it makes its depsgraph the active one,
+		so results are flushed back to the original data, e.g. obj.pose.bones[].matrix.
+		objects linked directly to the scene collection can't be excluded and are still evaluated.
+	'''
+
+	def __init__(self, objects=None):
+		super().__init__(objects)
+		self.scene = None
+		self.view_layer = None
+		self.collection = None
+
+	def __enter__(self):
+		self.scene = bpy.context.scene
+
+		# __exit__ isn't called if __enter__ raises, don't leave the temporary collection in the file
+		try:
+			self.collection = bpy.data.collections.new(ISOLATION_NAME)
+			self.scene.collection.children.link(self.collection)
+			for obj in get_evaluation_dependencies(self.objects):
+				self.collection.objects.link(obj)
+
+			self.view_layer = self.scene.view_layers.new(ISOLATION_NAME)
+			for layer_collection in self.view_layer.layer_collection.children:
+				if layer_collection.collection != self.collection:
+					layer_collection.exclude = True
+		except Exception:
+			self.remove_isolation()
+			raise
+
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.remove_isolation()
+		return False
+
+	def remove_isolation(self):
+		if self.view_layer is not None:
+			self.scene.view_layers.remove(self.view_layer)
+			self.view_layer = None
+
+		if self.collection is not None:
+			bpy.data.collections.remove(self.collection)
+			self.collection = None
+
+		# make the current view layer's depsgraph active again and evaluate it at the last frame
+		bpy.context.view_layer.update()
+
+	def set_frame(self, frame):
+		self.scene.frame_current = frame
+		self.view_layer.update()
+
+
+def get_frame_sampler(objects) -> FrameSampler:
+	'''	sampler for the given objects, isolated if enabled in the scene settings '''
+
+	if bpy.context.scene.x_anim.isolate_sampling:
+		return IsolatedFrameSampler(objects)
+	return FrameSampler(objects)
+
+
+def get_evaluation_dependencies(objects):
+	'''	given objects, plus all objects they depend on for evaluation:
+		parents, object / bone constraint targets (including pole targets and custom space objects)
+		and driver variable targets, recursively.
+		only objects need to be linked to the isolated collection: other datablocks used by drivers
+		(meshes, materials, shape keys, ...) aren't in collections, the depsgraph pulls them in through its relations
+	'''
+
+	result = []
+	visited = set()
+	pending = list(objects)
+
+	while pending:
+		obj = pending.pop()
+		if obj is None or obj.name in visited:
+			continue
+		visited.add(obj.name)
+		result.append(obj)
+
+		pending.append(obj.parent)
+
+		constraints = list(obj.constraints)
+		if obj.type == 'ARMATURE' and obj.pose:
+			for pose_bone in obj.pose.bones:
+				constraints.extend(pose_bone.constraints)
+
+		for constraint in constraints:
+			pending.append(getattr(constraint, 'target', None))
+			pending.append(getattr(constraint, 'pole_target', None))
+			pending.append(getattr(constraint, 'space_object', None))
+			for target in getattr(constraint, 'targets', []):
+				pending.append(target.target)
+
+		for id_data in (obj, obj.data):
+			animation_data = getattr(id_data, 'animation_data', None)
+			if animation_data is None:
+				continue
+			for driver in animation_data.drivers:
+				for variable in driver.driver.variables:
+					for target in variable.targets:
+						if isinstance(target.id, bpy.types.Object):
+							pending.append(target.id)
+
+	return result
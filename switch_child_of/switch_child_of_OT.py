@@ -10,6 +10,7 @@ class x_anim_OT_switch_child_of(Operator):
     bl_options = {'UNDO'}
 
     constraint_items = []
+    parent_keys = {} # constraint_items identifier -> (target name, subtarget)
     def get_constraint_items(self, context):
         return x_anim_OT_switch_child_of.constraint_items    
 
@@ -35,55 +36,13 @@ class x_anim_OT_switch_child_of(Operator):
             self.report({'ERROR'}, "A bone must be selected")
             return {'FINISHED'}            
         
-        active_constraint = None
-        
-        # collect current ChildOf constraints
-        if len(active_bone.constraints):
-            # get active one first
-            for c in active_bone.constraints:
-                if c.type == 'CHILD_OF':
-                    if c.influence > 0:
-                        active_constraint = c
-                        separator = ''
-                        if c.subtarget != '':
-                            separator = ': '
-                        #show not common alert
-                        not_common_string = '  [not common]'
-                        in_all_pb = True
-                        for pb in bpy.context.selected_pose_bones:
-                            in_this_pb = False
-                            for c0 in pb.constraints:
-                                if c0.type == 'CHILD_OF' and c0.target == c.target and c0.subtarget == c.subtarget:
-                                    in_this_pb = True
-                            in_all_pb = in_all_pb and in_this_pb
-                        if in_all_pb: 
-                            not_common_string = ''
-                        x_anim_OT_switch_child_of.constraint_items.append((c.name, c.target.name + separator + c.subtarget + not_common_string, ''))
-        
-            # others
-            for c in active_bone.constraints:
-                if c.type == 'CHILD_OF':
-                    if c != active_constraint or active_constraint == None:
-                        separator = ''
-                        if c.subtarget != '':
-                            separator = ': '
-                        #show not common alert
-                        not_common_string = '  [not common]'
-                        in_all_pb = True
-                        for pb in bpy.context.selected_pose_bones:
-                            in_this_pb = False
-                            for c0 in pb.constraints:
-                                if c0.type == 'CHILD_OF' and c0.target == c.target and c0.subtarget == c.subtarget:
-                                    in_this_pb = True
-                            in_all_pb = in_all_pb and in_this_pb
-                        if in_all_pb: 
-                            not_common_string = ''
-                        x_anim_OT_switch_child_of.constraint_items.append((c.name, c.target.name + separator + c.subtarget + not_common_string, ''))
-                  
-        x_anim_OT_switch_child_of.constraint_items.append(('NONE', 'None', 'None'))
-        
-        if active_constraint != None:
-            self.target_child_of = active_constraint.name
+        # one (target, subtarget) -> constraint map per bone, kept for draw and execute
+        items, parent_keys, active_item = switch_child_of_utils.get_child_of_items(active_bone, bpy.context.selected_pose_bones)
+        x_anim_OT_switch_child_of.constraint_items = items
+        x_anim_OT_switch_child_of.parent_keys = parent_keys
+
+        if active_item != None:
+            self.target_child_of = active_item
     
         if len(x_anim_OT_switch_child_of.constraint_items) == 1:
             self.report({'ERROR'}, "No ChildOf constraint found on active bone")
@@ -115,8 +74,11 @@ class x_anim_OT_switch_child_of(Operator):
 
 
     def execute(self, context):
+        # bones are matched by parent, not by constraint name
+        parent_key = x_anim_OT_switch_child_of.parent_keys.get(self.target_child_of)
+
         if self.bake_type == 'STATIC':
-            switch_child_of_utils.switch_child_of(self)
+            switch_child_of_utils.switch_child_of(parent_key)
         elif self.bake_type == 'ANIM':
-            switch_child_of_utils.bake_switch_child_of(self)
+            switch_child_of_utils.bake_switch_child_of(self, parent_key)
         return {'FINISHED'}
\ No newline at end of file
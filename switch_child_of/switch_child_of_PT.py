@@ -1,5 +1,6 @@
 import bpy
 from bpy.types import Panel
+from . import switch_child_of_timeline
 
 
 class x_anim_PT_switch_child_of(Panel):
@@ -17,4 +18,21 @@ class x_anim_PT_switch_child_of(Panel):
         row.label(text="Child Of Utils",icon="CON_CHILDOF")
         
         row = layout.row()
-        row.operator("x_anim.switch_child_of", text="Switch Child Of")
\ No newline at end of file
+        row.operator("x_anim.switch_child_of", text="Switch Child Of")
+
+        row = layout.row()
+        row.prop(props, "show_parent_timeline")
+
+        # active parent at the current frame, from the cached parent timeline
+        pb = context.active_pose_bone
+        if pb is not None and any(c.type == 'CHILD_OF' for c in pb.constraints):
+            parent_key, exclusive = switch_child_of_timeline.get_parent_timeline(pb, context.scene.frame_current, context.scene.frame_current).get_parent(context.scene.frame_current)
+
+            if parent_key is None:
+                text = "None"
+            else:
+                target_name, subtarget = parent_key
+                text = target_name + (': ' + subtarget if subtarget else '') + ('' if exclusive else '  [blended]')
+
+            row = layout.row()
+            row.label(text=f"Parent at frame {context.scene.frame_current}: {text}")
\ No newline at end of file
@@ -0,0 +1,301 @@
+import bpy
+import blf
+import gpu
+import numpy as np
+from bpy.app.handlers import persistent
+from gpu_extras.batch import batch_for_shader
+from .. import fcurve_utils
+from . import switch_child_of_utils
+
+
+#
+# parent timeline
+#
+# which Child Of parent is active at each frame, built from the influence fcurves of a bone,
+# stored as intervals (sorted start frames) and queried by bisection
+#
+
+class ParentTimeline:
+    """
+    Active Child Of parent of a pose bone over time.
+    starts[i] is the first frame of interval i, the first interval starts at -inf.
+    parents[i] indexes parent_keys, -1 when no Child Of has influence,
+    exclusive[i] is True when that parent is at full influence and all the others at 0.
+    when an influence curve is extrapolated or has modifiers, it isn't constant outside of its keys:
+    it is evaluated over frame_range too, and the timeline is only valid within self.frame_range, see covers()
+    """
+
+    def __init__(self, pb, frame_range=None):
+        self.parent_keys = []
+        self.signature = get_influence_signature(pb)
+
+        child_ofs = [c for c in pb.constraints if c.type == 'CHILD_OF']
+        for c in child_ofs:
+            parent_key = switch_child_of_utils.get_child_of_parent_key(c)
+            if parent_key not in self.parent_keys:
+                self.parent_keys.append(parent_key)
+
+        fcurves = get_influence_fcurves(pb, child_ofs)
+
+        # with constant extrapolation and no modifier, influences only change between the first and last keys
+        self.extrapolated = any(is_extrapolated(fcurve) for fcurve in fcurves.values())
+
+        bounds = [fcurve.keyframe_points[i].co[0] for fcurve in fcurves.values() for i in (0, -1) if len(fcurve.keyframe_points)]
+        if self.extrapolated and frame_range is not None:
+            bounds += list(frame_range)
+        if bounds:
+            frames = np.arange(np.floor(min(bounds)), np.ceil(max(bounds)) + 1)
+        else:
+            frames = np.zeros(1)
+        self.frame_range = (frames[0], frames[-1])
+
+        influences = np.empty((len(child_ofs), len(frames)))
+        for i, c in enumerate(child_ofs):
+            fcurve = fcurves.get(c.name)
+            if fcurve is None:
+                influences[i] = c.influence
+            else:
+                influences[i] = [fcurve.evaluate(frame) for frame in frames]
+
+        if len(child_ofs):
+            strongest = np.argmax(influences, axis=0)
+            strongest_influences = influences[strongest, np.arange(len(frames))]
+            parents = np.array([self.parent_keys.index(switch_child_of_utils.get_child_of_parent_key(child_ofs[i])) for i in strongest])
+            parents[strongest_influences <= 0.0] = -1
+            exclusive = (strongest_influences >= 1.0) & (np.sum(influences > 0.0, axis=0) == 1)
+            exclusive |= parents == -1
+        else:
+            parents = np.full(len(frames), -1)
+            exclusive = np.ones(len(frames), dtype=bool)
+
+        # run length encode into intervals
+        changes = np.flatnonzero((parents[1:] != parents[:-1]) | (exclusive[1:] != exclusive[:-1])) + 1
+
+        self.starts = np.concatenate([[-np.inf], frames[changes]])
+        self.parents = parents[np.concatenate([[0], changes])]
+        self.exclusive = exclusive[np.concatenate([[0], changes])]
+
+    def covers(self, first_frame, last_frame):
+        """
+        False if influences may change in [first_frame, last_frame] outside of what was evaluated
+        """
+
+        if not self.extrapolated:
+            return True
+        return self.frame_range[0] <= first_frame and last_frame <= self.frame_range[1]
+
+    def get_interval_indices(self, frames):
+        return np.searchsorted(self.starts, frames, side='right') - 1
+
+    def get_parent(self, frame):
+        """
+        (parent key or None, exclusive) at frame
+        """
+
+        i = self.get_interval_indices([frame])[0]
+        parent = self.parents[i]
+        return (self.parent_keys[parent] if parent >= 0 else None), bool(self.exclusive[i])
+
+    def is_exclusive_parent(self, frames, parent_key):
+        """
+        bool array, True at the frames where only parent_key is active, at full influence.
+        parent_key None is True where no Child Of has influence
+        """
+
+        parent = self.parent_keys.index(parent_key) if parent_key in self.parent_keys else -1
+        if parent_key is not None and parent == -1:
+            return np.zeros(len(frames), dtype=bool)
+
+        indices = self.get_interval_indices(frames)
+        return (self.parents[indices] == parent) & self.exclusive[indices]
+
+
+def get_influence_fcurves(pb, child_ofs):
+    """
+    {constraint name: influence fcurve} in the active action of the bone's armature
+    """
+
+    obj = pb.id_data
+    action = obj.animation_data.action if obj.animation_data else None
+    if action is None:
+        return {}
+
+    fcurve_index = fcurve_utils.get_fcurve_index(action)
+
+    fcurves = {}
+    for c in child_ofs:
+        fcurve = fcurve_index.find_data_path(c.path_from_id('influence'))
+        if fcurve is not None and not fcurve.mute:
+            fcurves[c.name] = fcurve
+    return fcurves
+
+
+def is_extrapolated(fcurve):
+    return fcurve.extrapolation != 'CONSTANT' or len(fcurve.modifiers) > 0
+
+
+def get_influence_signature(pb):
+    """
+    everything a ParentTimeline is built from, compared to find out if a cached one is out of date
+    """
+
+    child_ofs = [c for c in pb.constraints if c.type == 'CHILD_OF']
+    fcurves = get_influence_fcurves(pb, child_ofs)
+
+    signature = []
+    for c in child_ofs:
+        signature.append((c.name, switch_child_of_utils.get_child_of_parent_key(c), c.influence if c.name not in fcurves else None))
+
+        fcurve = fcurves.get(c.name)
+        if fcurve is not None:
+            co = np.empty(len(fcurve.keyframe_points) * 2)
+            handles = np.empty(len(fcurve.keyframe_points) * 4)
+            fcurve.keyframe_points.foreach_get('co', co)
+            fcurve.keyframe_points.foreach_get('handle_right', handles[:len(handles) // 2])
+            fcurve.keyframe_points.foreach_get('handle_left', handles[len(handles) // 2:])
+            interpolations = np.empty(len(fcurve.keyframe_points), dtype=np.int32)
+            fcurve.keyframe_points.foreach_get('interpolation', interpolations)
+            signature.append((co.tobytes(), handles.tobytes(), interpolations.tobytes(), fcurve.extrapolation, len(fcurve.modifiers)))
+
+    return tuple(signature)
+
+
+#
+# cache
+#
+# timelines are kept per bone, keyed by armature pointer. they reuse the versions of fcurve_utils:
+# when the action or the armature is updated, the timelines of its bones are checked against their signature
+# on next use and rebuilt if it changed. undo, redo and file loads drop them with the fcurve indices
+#
+
+timeline_cache = {} # (armature pointer, bone name) -> (ParentTimeline, versions when last checked)
+
+
+def get_versions(pb):
+    """
+    what a cached timeline was last checked against, the armature name catches a pointer reused by another armature
+    """
+
+    obj = pb.id_data
+    action = obj.animation_data.action if obj.animation_data else None
+    action_key = fcurve_utils.get_action_key(action) if action else None
+    return (obj.name, fcurve_utils.versions.get(fcurve_utils.get_action_key(obj), 0), action_key, fcurve_utils.versions.get(action_key, 0))
+
+
+def get_parent_timeline(pb, first_frame=None, last_frame=None) -> ParentTimeline:
+    """
+    cached timeline of pb, valid at least over [first_frame, last_frame] (the scene range if None)
+    """
+
+    scene = bpy.context.scene
+    first_frame = min(scene.frame_start, scene.frame_start if first_frame is None else first_frame)
+    last_frame = max(scene.frame_end, scene.frame_end if last_frame is None else last_frame)
+
+    key = (fcurve_utils.get_action_key(pb.id_data), pb.name)
+    current_versions = get_versions(pb)
+
+    cached = timeline_cache.get(key)
+    if cached is not None:
+        timeline, checked_versions = cached
+        if timeline.covers(first_frame, last_frame):
+            if checked_versions == current_versions:
+                return timeline
+            # modifier settings aren't part of the signature, extrapolated timelines are rebuilt on any update
+            if not timeline.extrapolated and timeline.signature == get_influence_signature(pb):
+                timeline_cache[key] = (timeline, current_versions)
+                return timeline
+
+    timeline = ParentTimeline(pb, (first_frame, last_frame))
+    timeline_cache[key] = (timeline, current_versions)
+    return timeline
+
+
+@persistent
+def parent_timeline_clear(*args):
+    timeline_cache.clear()
+
+
+#
+# dope sheet / timeline overlay
+#
+
+PARENT_COLORS = [
+    (0.9, 0.5, 0.2),
+    (0.3, 0.7, 0.9),
+    (0.5, 0.85, 0.35),
+    (0.85, 0.35, 0.7),
+    (0.95, 0.85, 0.3),
+    (0.6, 0.5, 0.95),
+]
+
+OVERLAY_HEIGHT = 6
+OVERLAY_BOTTOM = 24 # above the scrollbar
+
+draw_handler = None
+
+
+def draw_parent_timeline():
+    context = bpy.context
+    if not context.scene.x_anim.show_parent_timeline:
+        return
+
+    pb = context.active_pose_bone
+    if pb is None or not any(c.type == 'CHILD_OF' for c in pb.constraints):
+        return
+
+    region = context.region
+    view2d = region.view2d
+    first_frame = view2d.region_to_view(0, 0)[0]
+    last_frame = view2d.region_to_view(region.width, 0)[0]
+
+    timeline = get_parent_timeline(pb, first_frame, last_frame)
+
+    shader = gpu.shader.from_builtin('UNIFORM_COLOR')
+    gpu.state.blend_set('ALPHA')
+
+    ends = np.concatenate([timeline.starts[1:], [np.inf]])
+    for start, end, parent, exclusive in zip(timeline.starts, ends, timeline.parents, timeline.exclusive):
+        if end < first_frame or start > last_frame or parent < 0:
+            continue
+
+        x0 = view2d.view_to_region(max(start, first_frame), 0, clip=False)[0]
+        x1 = view2d.view_to_region(min(end, last_frame), 0, clip=False)[0]
+        y0 = OVERLAY_BOTTOM
+        y1 = OVERLAY_BOTTOM + OVERLAY_HEIGHT
+
+        # partial influences are drawn fainter
+        color = PARENT_COLORS[parent % len(PARENT_COLORS)] + ((0.9,) if exclusive else (0.4,))
+
+        batch = batch_for_shader(shader, 'TRIS', {"pos": [(x0, y0), (x1, y0), (x1, y1), (x0, y1)]}, indices=[(0, 1, 2), (0, 2, 3)])
+        shader.uniform_float("color", color)
+        batch.draw(shader)
+
+        target_name, subtarget = timeline.parent_keys[parent]
+        blf.position(0, x0 + 2, y1 + 2, 0)
+        blf.size(0, 11)
+        blf.color(0, *color)
+        blf.draw(0, subtarget or target_name)
+
+    gpu.state.blend_set('NONE')
+
+
+#
+# register
+#
+
+def register():
+    global draw_handler
+    draw_handler = bpy.types.SpaceDopeSheetEditor.draw_handler_add(draw_parent_timeline, (), 'WINDOW', 'POST_PIXEL')
+
+    bpy.app.handlers.load_post.append(parent_timeline_clear)
+    bpy.app.handlers.undo_post.append(parent_timeline_clear)
+    bpy.app.handlers.redo_post.append(parent_timeline_clear)
+
+def unregister():
+    global draw_handler
+    bpy.types.SpaceDopeSheetEditor.draw_handler_remove(draw_handler, 'WINDOW')
+    draw_handler = None
+
+    bpy.app.handlers.redo_post.remove(parent_timeline_clear)
+    bpy.app.handlers.undo_post.remove(parent_timeline_clear)
+    bpy.app.handlers.load_post.remove(parent_timeline_clear)
@@ -1,21 +1,89 @@
 from ..utils import *
+from .. import array_utils, child_of_utils, fcurve_utils, sampling_utils
+from . import switch_child_of_timeline
 
 
-def switch_child_of(self):
+def get_child_of_parent_key(c):
+    """
+    (target name, subtarget) of a Child Of constraint, identifies its parent whatever the constraint is named
+    """
+    return (c.target.name if c.target else '', c.subtarget)
+
+
+def get_child_of_map(pb):
+    """
+    {parent key: Child Of constraint} of a pose bone, see get_child_of_parent_key
+    """
+
+    child_of_map = {}
+    for c in pb.constraints:
+        if c.type == 'CHILD_OF':
+            child_of_map.setdefault(get_child_of_parent_key(c), c)
+    return child_of_map
+
+
+def get_child_of_items(active_bone, pose_bones):
+    """
+    enum items of the parents of active_bone's Child Of constraints, the active one first, then 'NONE'.
+    each bone's constraints are mapped by parent once, parents that some of the bones don't have are marked [not common].
+    returns (items, {item identifier: parent key}, identifier of the active parent or None)
+    """
+
+    # on how many bones each parent is found
+    parent_counts = {}
+    for pb in pose_bones:
+        for parent_key in get_child_of_map(pb):
+            parent_counts[parent_key] = parent_counts.get(parent_key, 0) + 1
+
+    child_of_map = get_child_of_map(active_bone)
+
+    # the active one is the last with some influence, then the others in constraint order
+    active_key = None
+    for parent_key, c in child_of_map.items():
+        if c.influence > 0:
+            active_key = parent_key
+
+    parent_keys = list(child_of_map)
+    if active_key is not None:
+        parent_keys.remove(active_key)
+        parent_keys.insert(0, active_key)
+
+    items = []
+    item_parent_keys = {}
+    for i, parent_key in enumerate(parent_keys):
+        target_name, subtarget = parent_key
+        separator = ': ' if subtarget else ''
+        not_common_string = '' if parent_counts[parent_key] == len(pose_bones) else '  [not common]'
+
+        identifier = f'PARENT_{i}'
+        items.append((identifier, target_name + separator + subtarget + not_common_string, ''))
+        item_parent_keys[identifier] = parent_key
+
+    items.append(('NONE', 'None', 'None'))
+
+    return items, item_parent_keys, 'PARENT_0' if active_key is not None else None
+
+
+def switch_child_of(parent_key):
+    """
+    switch the selected pose bones to their Child Of constraint of the given parent, keeping their transforms.
+    parent_key None disables all of them
+    """
+
+    # parents are read once, all bones are snapped against the pose from before the switch
+    matrices = child_of_utils.FrameMatrices()
 
     for pb in bpy.context.selected_pose_bones:
+        target = get_child_of_map(pb).get(parent_key)
 
         for c in pb.constraints: 
             if c.type != 'CHILD_OF':
                 continue
-            if c.name != self.target_child_of:            
+            if c != target:            
                 disable_child_of(pb, c)  
 
-        for c in pb.constraints:
-            if c.type != 'CHILD_OF':
-                continue
-            if c.name == self.target_child_of:
-                enable_child_of(pb, c)
+        if target is not None:
+            enable_child_of(pb, target, matrices)
 
 
 def disable_child_of(pb, c):
@@ -43,29 +111,21 @@ def disable_child_of(pb, c):
             
         
 
-def enable_child_of(pb, c):
+def enable_child_of(pb, c, matrices : child_of_utils.FrameMatrices = None):
     mat_prev = pb.matrix.copy()
+
+    if matrices is None:
+        matrices = child_of_utils.FrameMatrices(batched=False)
     
     if c.influence != 1.0:
 
-        parent_type = 'bone' if c.subtarget else 'object'
-        parent_name = c.subtarget if parent_type == 'bone' else c.target.name            
-
         # set influence
         c.influence = 1.0
         
         # update_transform() 
         
-        # snap
-        if parent_type == 'bone':
-            bone_parent = get_pose_bone(bpy.context.active_object, parent_name)
-            pb.matrix = c.inverse_matrix.inverted() @ bone_parent.matrix.inverted() @ mat_prev
-            
-            # update_transform()
-            
-        elif parent_type == 'object':
-            obj_par = get_object(parent_name)
-            pb.matrix = c.inverse_matrix.inverted() @ obj_par.matrix_world.inverted() @ mat_prev
+        # snap, to the parent bone or object, in world space
+        pb.matrix = Matrix(child_of_utils.get_child_of_snap_matrix(c, pb.id_data, np.array(mat_prev), matrices))
             
         
         keyframe_pb_transforms(pb)
@@ -73,67 +133,229 @@ def enable_child_of(pb, c):
 
 
 
-def keyframe_selected_pose_bones():
+def get_selected_pose_bones_keyed_frames(frame_start, frame_end):
+    """
+    frames strictly between frame_start and frame_end where the selected pose bones,
+    or their constraint influences, have keys in the active action of their armature
+    """
+
+    fcurves = []
+    fcurve_indices = {}
+
     for pb in bpy.context.selected_pose_bones:
-        keyframe_pb_transforms(pb)
-        for c in pb.constraints:
-            if c.type == "CHILD_OF":
-                c.keyframe_insert(data_path="influence")
-    
+        obj = pb.id_data
+        if obj.animation_data is None or obj.animation_data.action is None:
+            continue
 
+        if obj.name not in fcurve_indices:
+            fcurve_indices[obj.name] = fcurve_utils.get_fcurve_index(obj.animation_data.action)
 
-def bake_switch_child_of(self):
-    
-    if self.only_at_keyframe:
+        fcurves.extend(fcurve for prop, index, fcurve in fcurve_indices[obj.name].get_bone_fcurves(pb.name))
+
+    frames = np.unique(np.round(fcurve_utils.get_keyed_frames(fcurves)).astype(int))
+
+    return [int(frame) for frame in frames if frame_start < frame < frame_end]
+
+
+class ChildOfSwitch:
+    """
+    One selected pose bone of bake_switch_child_of, its Child Of constraints and sampled data
+    """
+
+    def __init__(self, pb, parent_key):
+        self.pb = pb
+        self.obj = pb.id_data
+        self.child_ofs = [c for c in pb.constraints if c.type == 'CHILD_OF']
+        self.target = get_child_of_map(pb).get(parent_key)
+
+        self.bone_index = int(array_utils.get_pose_bone_indices(self.obj, [pb.name])[0])
+        self.parent_index = int(array_utils.get_parent_pose_bone_indices(self.obj, [pb.name])[0])
+        self.parent_to_rest = array_utils.get_parent_to_rest_matrix_stack(self.obj, [pb.name])[0]
+
+        # the basis follows the parent and rest matrices only with the default inheritance,
+        # otherwise blender converts it frame by frame while sampling, see sample_basis
+        bone = pb.bone
+        self.use_rest_matrices = bone.use_inherit_rotation and bone.inherit_scale == 'FULL' and bone.use_local_location
+        self.sampled_basis = None
+
+        # current values of the first and last sampled frames, written back as they are
+        self.edge_basis = np.empty((2, 4, 4))
+        self.edge_influences = np.empty((2, len(self.child_ofs)))
+
+    def sample_edge(self, edge):
+        self.edge_basis[edge] = np.array(self.pb.matrix_basis)
+        self.edge_influences[edge] = [c.influence for c in self.child_ofs]
+
+    def get_target_matrices(self, pose_matrices, object_matrices, rows=slice(None)):
+        """
+        (frames, 4, 4) world matrices of the target constraint's parent, None if there is no target.
+        rows selects the sampled frames, a single index gives one (4, 4) matrix
+        """
+
+        c = self.target
+        if c is None or c.target is None:
+            return None
+
+        matrices = object_matrices[c.target.name][rows]
+        if c.subtarget:
+            matrices = matrices @ pose_matrices[c.target.name][rows, array_utils.get_pose_bone_indices(c.target, [c.subtarget])[0]]
+        return matrices
+
+    def get_snap_matrices(self, pose_matrices, object_matrices, rows=slice(None)):
+        """
+        (frames, 4, 4) pose matrices keeping the sampled visual matrices with only the target Child Of enabled.
+        same snapping as enable_child_of, done for all the frames of rows at once
+        """
+
+        visual = pose_matrices[self.obj.name][rows, self.bone_index]
+
+        target_matrices = self.get_target_matrices(pose_matrices, object_matrices, rows)
+        if target_matrices is None:
+            # no parent left, the visual matrix is kept as is
+            return visual
 
-        #prepass
-        # frame_start & frame_start - 1
-        set_frame_fast(self.frame_start)
-        keyframe_selected_pose_bones()
-        set_frame_fast(self.frame_start - 1)
-        keyframe_selected_pose_bones()
+        return child_of_utils.get_child_of_snap_matrices(np.array(self.target.inverse_matrix), object_matrices[self.obj.name][rows], target_matrices, visual)
 
-        # frames in between
-        prev_frame = self.frame_start - 1
-        while bpy.context.scene.frame_current < self.frame_end:
-            bpy.ops.screen.keyframe_jump(next=True)
+    def sample_basis(self, i, pose_matrices, object_matrices):
+        """
+        matrix_basis of sampled frame i, converted by blender at the current frame,
+        for bones that don't inherit rotation or scale fully or don't use local location
+        """
 
-            if prev_frame == bpy.context.scene.frame_current or bpy.context.scene.frame_current > self.frame_end:
-                break
-            prev_frame = bpy.context.scene.frame_current
-            keyframe_selected_pose_bones()
+        if self.sampled_basis is None:
+            self.sampled_basis = np.empty((len(object_matrices[self.obj.name]), 4, 4))
 
+        matrix = self.get_snap_matrices(pose_matrices, object_matrices, i)
+        self.sampled_basis[i] = np.array(self.obj.convert_space(pose_bone=self.pb, matrix=Matrix(matrix), from_space='POSE', to_space='LOCAL'))
 
-        # frame_end & frame_end + 1
-        set_frame_fast(self.frame_end)
-        keyframe_selected_pose_bones()
-        set_frame_fast(self.frame_end + 1)
-        keyframe_selected_pose_bones()
+    def get_basis_matrices(self, pose_matrices, object_matrices):
+        """
+        (frames, 4, 4) matrix_basis of get_snap_matrices for all frames at once,
+        through the parent and rest matrices, or as converted by sample_basis
+        """
 
+        if not self.use_rest_matrices:
+            basis = self.sampled_basis.copy()
+        else:
+            matrices = self.get_snap_matrices(pose_matrices, object_matrices)
+            basis = self.parent_to_rest @ np.linalg.solve(pose_matrices[self.obj.name][:, self.parent_index], matrices)
 
+        basis[0] = self.edge_basis[0]
+        basis[-1] = self.edge_basis[1]
 
-        #switch pass
-        set_frame_fast(self.frame_start - 1)
-        prev_frame = self.frame_start - 1
-        while bpy.context.scene.frame_current < self.frame_end:
-            bpy.ops.screen.keyframe_jump(next=True)
+        return basis
 
-            if prev_frame == bpy.context.scene.frame_current or bpy.context.scene.frame_current > self.frame_end:
-                break
+    def write_keyframes(self, frames, basis):
+        pb = self.pb
+        action = get_or_create_action(self.obj)
 
-            prev_frame = bpy.context.scene.frame_current
-            switch_child_of(self) 
+        channels = decompose_to_transform_channels(pb, [Matrix(matrix) for matrix in basis])
 
+        for prop, values in channels.items():
+            data_path = pb.path_from_id(prop)
+            values = np.asarray(values)
 
+            for i, locked in enumerate(get_transform_locks(pb, prop)):
+                if locked:
+                    continue
+
+                fcurve = get_or_create_fcurve(action, data_path, index=i, group=pb.name)
+                bulk_insert_keyframes(fcurve, frames, values[:, i])
+
+        for i, c in enumerate(self.child_ofs):
+            influences = np.full(len(frames), 1.0 if c == self.target else 0.0)
+            influences[0] = self.edge_influences[0, i]
+            influences[-1] = self.edge_influences[1, i]
+
+            fcurve = get_or_create_fcurve(action, c.path_from_id('influence'), group=pb.name)
+            bulk_insert_keyframes(fcurve, frames, influences)
+
+
+def get_frames_to_switch(pb, parent_key, frames):
+    """
+    bool mask of the frames where keys are written, None if the bone is already on parent_key over all frames.
+    frames already on parent_key alone (see ParentTimeline) are skipped, 
+    except next to the frames that change, and the first and last one, so the curves stay pinned there
+    """
+
+    unchanged = switch_child_of_timeline.get_parent_timeline(pb, frames[0], frames[-1]).is_exclusive_parent(frames, parent_key)
+    if unchanged[1:-1].all():
+        return None
+
+    changed = ~unchanged
+    keep = changed.copy()
+    keep[1:] |= changed[:-1]
+    keep[:-1] |= changed[1:]
+    keep[0] = keep[-1] = True
+
+    return keep
+
+
+def bake_switch_child_of(self, parent_key):
+    """
+    Switch the selected pose bones to their Child Of constraint of the given parent (see get_child_of_parent_key)
+    over the frame range, keeping their visual transforms.
+    Two passes like baking_utils.FastBakeJob: the visual matrices of the bones and of every candidate parent are sampled,
+    then the new transforms and influences are computed for all frames at once and written in bulk.
+    frame_start - 1 and frame_end + 1 are sampled too and written back with their current values,
+    to protect the animation outside the range.
+    """
+
+    if self.only_at_keyframe:
+        # keyed frames are collected once from the fcurves, instead of jumping from key to key
+        frames = [self.frame_start] + get_selected_pose_bones_keyed_frames(self.frame_start, self.frame_end) + [self.frame_end]
+        frames = sorted(set(frames))
     else:
-        #prepass
-        for i in range(self.frame_start - 1, self.frame_end + 2):
-            set_frame_fast(i)
+        frames = list(range(self.frame_start, self.frame_end + 1))
+
+    frames = np.array([self.frame_start - 1] + frames + [self.frame_end + 1])
+
+    switches = [ChildOfSwitch(pb, parent_key) for pb in bpy.context.selected_pose_bones]
+    switches = [switch for switch in switches if switch.child_ofs]
+    if not switches:
+        return
+
+    # armatures whose pose matrices are read, objects whose world matrices are read
+    armatures = {}
+    objects = {}
+    for switch in switches:
+        armatures[switch.obj.name] = switch.obj
+        objects[switch.obj.name] = switch.obj
+        for c in switch.child_ofs:
+            if c.target is None:
+                continue
+            if c.subtarget:
+                armatures[c.target.name] = c.target
+            objects[c.target.name] = c.target
+
+    # float64, like child_of_utils.FrameMatrices: they go through np.linalg.solve, float32 loses precision on big rigs far from the origin
+    pose_matrices = {name: np.empty((len(frames), len(obj.pose.bones) + 1, 4, 4)) for name, obj in armatures.items()}
+    object_matrices = {name: np.empty((len(frames), 4, 4)) for name in objects}
+
+    # first pass, sample
+    with sampling_utils.get_frame_sampler(list(armatures.values()) + list(objects.values())) as sampler:
+
+        for i, frame in enumerate(frames):
+            sampler.set_frame(int(frame))
+
+            for name, obj in armatures.items():
+                array_utils.read_pose_bone_matrices(obj, pose_matrices[name][i])
+            for name, obj in objects.items():
+                object_matrices[name][i] = np.array(obj.matrix_world)
+
+            if i == 0 or i == len(frames) - 1:
+                for switch in switches:
+                    switch.sample_edge(0 if i == 0 else 1)
 
-            keyframe_selected_pose_bones()
+            for switch in switches:
+                if not switch.use_rest_matrices:
+                    switch.sample_basis(i, pose_matrices, object_matrices)
 
-        #switch pass
-        for i in range(self.frame_start, self.frame_end + 1):
-            set_frame_fast(i)
+    # second pass, compute and write
+    for switch in switches:
+        keep = get_frames_to_switch(switch.pb, parent_key, frames)
+        if keep is None:
+            continue
 
-            switch_child_of(self)
\ No newline at end of file
+        basis = switch.get_basis_matrices(pose_matrices, object_matrices)
+        switch.write_keyframes(frames[keep], basis[keep])
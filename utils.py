@@ -1,8 +1,10 @@
 import math
+import numpy as np
 import mathutils
 from mathutils import Matrix, Vector
 import bpy
 from bpy.types import PoseBone
+from . import child_of_utils, fcurve_utils
 
 
 
@@ -87,24 +89,23 @@ def get_edit_bone(object, name):
 
 
 def get_data_on_keyframe(object, name, keyframe, index=0):
-    if object.animation_data == None:
+    if object.animation_data == None or object.animation_data.action == None:
         print("No animation data!")
         return None
-    fcurve = object.animation_data.action.fcurves.find(name, index=index)
+    fcurve = fcurve_utils.get_fcurve_index(object.animation_data.action).find_data_path(name, index)
     if fcurve != None:
         return fcurve.evaluate(keyframe)
     return None
 
 
 def has_keyframe(object, name, frame, index=0):
-    if object.animation_data == None:
+    if object.animation_data == None or object.animation_data.action == None:
         print("No animation data!")
         return None
-    fcurve = object.animation_data.action.fcurves.find(name, index=index)
+    fcurve_index = fcurve_utils.get_fcurve_index(object.animation_data.action)
+    fcurve = fcurve_index.find_data_path(name, index)
     if fcurve != None:
-        for keyframe in fcurve.keyframe_points:
-            if int(keyframe.co[0]) == frame:
-                return True
+        return fcurve_index.has_keyframe(fcurve, frame)
     return False
 
 
@@ -178,17 +179,34 @@ def find_layer_collection_recursive(root_layer_collection, name):
 def load_pose(action, bone_name):
     location = [0, 0, 0]
     rotation_quaternion = [1, 0, 0, 0]
-    for fcurve in action.fcurves:
-        # path_array = fcurve.data_path.split(".")
-        path = fcurve.data_path
-        if path == f"pose.bones[\"{bone_name}\"].location":
-            location[fcurve.array_index] = fcurve.keyframe_points[0].co[1]
-        if path == f"pose.bones[\"{bone_name}\"].rotation_quaternion":
-            rotation_quaternion[fcurve.array_index] = fcurve.keyframe_points[0].co[1]
+    fcurve_index = fcurve_utils.get_fcurve_index(action)
+    for prop, values in (("location", location), ("rotation_quaternion", rotation_quaternion)):
+        for i in range(len(values)):
+            fcurve = fcurve_index.find(bone_name, prop, i)
+            if fcurve != None:
+                values[i] = fcurve.keyframe_points[0].co[1]
 
     return {"location": mathutils.Vector(location), "rotation_quaternion": mathutils.Quaternion(rotation_quaternion)}
 
 
+# matrix converting world space locations to the pose space of bone, at current frame.
+# takes all its Child Of constraints into account, see child_of_utils.
+# only the matrices this bone needs are read, unless a FrameMatrices shared between calls is given,
+# which is then only read once: clear() it after changing the pose
+def get_world_to_pose_location_matrix(bone : bpy.types.PoseBone, matrices : child_of_utils.FrameMatrices = None) -> Matrix:
+    return Matrix(child_of_utils.ChildOfSolver([bone], matrices).get_world_to_pose_matrices()[0])
+
+
+# matrix converting pose space locations to bone.location, what setting bone.matrix.translation does, at current frame
+def get_pose_to_local_location_matrix(bone : bpy.types.PoseBone, matrices : child_of_utils.FrameMatrices = None) -> Matrix:
+    return Matrix(child_of_utils.ChildOfSolver([bone], matrices).get_pose_to_local_matrices()[0])
+
+
+# matrix converting world space locations to bone.location, same as set_bone_position(world_space=True), at current frame
+def get_world_to_local_location_matrix(bone : bpy.types.PoseBone, matrices : child_of_utils.FrameMatrices = None) -> Matrix:
+    return Matrix(child_of_utils.ChildOfSolver([bone], matrices).get_world_to_local_matrices()[0])
+
+
 # set position at current frame
 def set_bone_position(bone : bpy.types.PoseBone, pos, world_space = False, key = True):
     if pos == None:
@@ -201,31 +219,7 @@ def set_bone_position(bone : bpy.types.PoseBone, pos, world_space = False, key =
 
     else:
 
-        armature : bpy.types.Armature = bone.id_data
-
-        has_child_of_constraint = False
-        constraint_parent_matrix = None
-        # TODO: only consider the condition when it has subtarget and influence == 1 for now.
-        for c in bone.constraints: 
-            if c.type == 'CHILD_OF' and c.target != None and c.influence >= 0.99 and c.enabled:
-                has_child_of_constraint = True
-                parent_obj = c.target
-                parent_bone = get_pose_bone(parent_obj, c.subtarget)
-
-                constraint_parent_matrix = Matrix.identity
-
-                if parent_obj is not None:
-                    constraint_parent_matrix = parent_obj.matrix_world.inverted() # world to object
-                
-                if parent_bone is not None:
-                    constraint_parent_matrix = parent_bone.matrix.inverted() @ constraint_parent_matrix # object to bone
-
-                constraint_parent_matrix = c.inverse_matrix.inverted() @ constraint_parent_matrix # bone to constraint 
-
-        if has_child_of_constraint:
-            bone.matrix.translation = constraint_parent_matrix @ mathutils.Vector(pos)   
-        else:
-            bone.matrix.translation = armature.matrix_world.inverted() @ mathutils.Vector(pos) # set pos in armature (pose) space
+        bone.matrix.translation = get_world_to_pose_location_matrix(bone) @ mathutils.Vector(pos)
         
 
     if key:
@@ -311,6 +305,73 @@ def get_final_local_location(pose_bone, parent_to_rest_matrix=None):
 	
 	return current_to_rest_matrix.to_translation()
 
+def get_rotation_data_path(pose_bone):
+	if pose_bone.rotation_mode == 'QUATERNION':
+		return 'rotation_quaternion'
+	if pose_bone.rotation_mode == 'AXIS_ANGLE':
+		return 'rotation_axis_angle'
+	return 'rotation_euler'
+
+def get_transform_locks(pose_bone, prop):
+	'''	lock state of each array index of the given transform property '''
+
+	if prop == 'location':
+		return list(pose_bone.lock_location)
+	if prop == 'scale':
+		return list(pose_bone.lock_scale)
+	if prop in ('rotation_quaternion', 'rotation_axis_angle'):
+		return [pose_bone.lock_rotation_w] + list(pose_bone.lock_rotation)
+	return list(pose_bone.lock_rotation)
+
+def decompose_to_transform_channels(pose_bone, matrices, location=True, rotation=True, scale=True):
+	'''	decompose a sequence of local (current to rest) matrices into
+		{prop: [value per matrix]}, rotation follows pose_bone.rotation_mode.
+		eulers are kept compatible with the previous frame and quaternions stay
+		in the same hemisphere, so the curves don't flip
+	'''
+
+	rotation_path = get_rotation_data_path(pose_bone)
+
+	channels = {}
+	if location:
+		channels['location'] = []
+	if rotation:
+		channels[rotation_path] = []
+	if scale:
+		channels['scale'] = []
+
+	prev_euler = None
+	prev_quaternion = None
+
+	for matrix in matrices:
+		loc, quaternion, sca = matrix.decompose()
+
+		if location:
+			channels['location'].append(loc)
+
+		if rotation:
+			if rotation_path == 'rotation_euler':
+				if prev_euler is None:
+					euler = matrix.to_euler(pose_bone.rotation_mode)
+				else:
+					euler = matrix.to_euler(pose_bone.rotation_mode, prev_euler)
+				channels[rotation_path].append(euler)
+				prev_euler = euler
+			else:
+				if prev_quaternion is not None and prev_quaternion.dot(quaternion) < 0.0:
+					quaternion.negate()
+				prev_quaternion = quaternion
+				if rotation_path == 'rotation_quaternion':
+					channels[rotation_path].append(quaternion)
+				else:
+					axis, angle = quaternion.to_axis_angle()
+					channels[rotation_path].append((angle, axis[0], axis[1], axis[2]))
+
+		if scale:
+			channels['scale'].append(sca)
+
+	return channels
+
 def set_frame_fast(frame):
 	'''	set frame and only update the depsgraph,
 		which means only updating what's enabled in the scene
@@ -323,6 +384,110 @@ def set_frame_fast(frame):
 	depsgraph = bpy.context.evaluated_depsgraph_get()
 	depsgraph.update()
 
+
+####fcurve related things####
+
+# raw values of the Keyframe.interpolation enum, for foreach_set
+KEYFRAME_INTERPOLATION_VALUES = {'CONSTANT': 0, 'LINEAR': 1, 'BEZIER': 2}
+
+# keyframe attributes read and written back by bulk_insert_keyframes: (name, size, dtype)
+KEYFRAME_ATTRIBUTES = [
+	('co', 2, np.float32),
+	('handle_left', 2, np.float32),
+	('handle_right', 2, np.float32),
+	('handle_left_type', 1, np.int32),
+	('handle_right_type', 1, np.int32),
+	('interpolation', 1, np.int32),
+	('easing', 1, np.int32),
+	('type', 1, np.int32),
+	('select_control_point', 1, bool),
+]
+
+def get_or_create_action(obj):
+	'''	the active action of obj, a new one is created if there is none '''
+
+	if obj.animation_data is None:
+		obj.animation_data_create()
+
+	if obj.animation_data.action is None:
+		obj.animation_data.action = bpy.data.actions.new(obj.name + "Action")
+
+	return obj.animation_data.action
+
+def get_or_create_fcurve(action, data_path, index=0, group=None):
+	fcurve_index = fcurve_utils.get_fcurve_index(action)
+	fcurve = fcurve_index.find_data_path(data_path, index)
+	if fcurve is None:
+		if group:
+			fcurve = action.fcurves.new(data_path, index=index, action_group=group)
+		else:
+			fcurve = action.fcurves.new(data_path, index=index)
+		fcurve_index.add(fcurve)
+	return fcurve
+
+def bulk_insert_keyframes(fcurve, frames, values, interpolation='BEZIER', clear_range=False):
+	'''	insert keyframes (frames[i], values[i]) into fcurve in one go.
+		existing keyframes on the given frames are replaced, others are kept,
+		with clear_range, all existing keyframes between the first and last given frame are replaced.
+		much faster than calling keyframe_insert once per frame
+	'''
+
+	frames = np.asarray(frames, dtype=np.float32)
+	values = np.asarray(values, dtype=np.float32)
+	count = len(frames)
+	if count == 0:
+		return
+
+	points = fcurve.keyframe_points
+
+	# existing keyframes, all read at once
+	existing = len(points)
+	kept = {}
+	if existing:
+		co = np.empty(existing * 2, dtype=np.float32)
+		points.foreach_get('co', co)
+		if clear_range:
+			overwritten = (co[0::2] >= frames.min()) & (co[0::2] <= frames.max())
+		else:
+			overwritten = np.isin(co[0::2], frames)
+		keep = ~overwritten
+
+		for attribute, size, dtype in KEYFRAME_ATTRIBUTES:
+			if attribute == 'co':
+				data = co
+			else:
+				data = np.empty(existing * size, dtype=dtype)
+				points.foreach_get(attribute, data)
+			kept[attribute] = data.reshape(existing, size)[keep]
+
+	kept_count = int(keep.sum()) if existing else 0
+	total = kept_count + count
+
+	# rebuild the keyframes in one go: the kept ones written back unchanged, then the new ones.
+	# the attributes of the new keyframes keep the defaults of points.add
+	points.clear()
+	points.add(total)
+
+	for attribute, size, dtype in KEYFRAME_ATTRIBUTES:
+		data = np.empty(total * size, dtype=dtype)
+		points.foreach_get(attribute, data)
+		data = data.reshape(total, size)
+
+		if kept_count:
+			data[:kept_count] = kept[attribute]
+		if attribute == 'co':
+			data[kept_count:, 0] = frames
+			data[kept_count:, 1] = values
+		elif attribute == 'interpolation':
+			data[kept_count:, 0] = KEYFRAME_INTERPOLATION_VALUES[interpolation]
+
+		points.foreach_set(attribute, data.ravel())
+
+	# sort keyframes and recalculate handles
+	fcurve.update()
+
+	fcurve_utils.forget_keyed_frames(fcurve)
+
 '''
 # LEGACY
 # [start, end - 1] 